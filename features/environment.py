@@ -1,19 +1,132 @@
+import json
 import os
+import sys
+import time
+import allure
 from dotenv import load_dotenv
 
+# Make the repo root importable so steps can use tests.utils helpers
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tests.utils.api_client import APIClient, RequestCoalescer
+from tests.utils.book_capture import BookCapture
+from tests.utils.candle_cache import CandleCache
+from tests.utils.metrics import STEP_SECONDS, metrics
+from tests.utils.mock_exchange import MockExchange
+from tests.utils.reconnect import Backoff
+from tests.utils.recorder import RUN_ANCHOR, TrafficRecorder, TrafficReplay
+from tests.utils.ws_pool import WSConnectionPool
+
+def metrics_file():
+    # Parallel workers each write their own file next to the requested one
+    path = os.getenv("METRICS_FILE")
+    worker = os.getenv("BEHAVE_WORKER")
+    if path and worker is not None:
+        root, ext = os.path.splitext(path)
+        path = f"{root}-worker-{worker}{ext}"
+    return path
+
 def before_all(context):
     load_dotenv()  # Load .env file
+    # METRICS_PORT serves Prometheus text at /metrics while the run lasts;
+    # METRICS_FILE gets a final dump in after_all
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        port = metrics.serve(int(metrics_port) + int(os.getenv("BEHAVE_WORKER", "0")))
+        print(f"Metrics on http://localhost:{port}/metrics")
     context.base_url = os.getenv("BASE_URL")
     context.ws_url = os.getenv("WS_URL")
+    # MOCK_EXCHANGE=1 runs the suite offline against an in-process stand-in
+    context.mock_exchange = None
+    if os.getenv("MOCK_EXCHANGE", "").lower() in ("1", "true", "yes"):
+        context.mock_exchange = MockExchange(
+            rate=float(os.getenv("MOCK_RATE", "10")),
+            latency=float(os.getenv("MOCK_LATENCY", "0")),
+            error_rate=float(os.getenv("MOCK_ERROR_RATE", "0")),
+            disconnect_after=int(os.getenv("MOCK_DISCONNECT_AFTER", "0")) or None,
+            fixtures=os.getenv("MOCK_FIXTURES"),
+            deltas=os.getenv("MOCK_BOOK_DELTAS", "").lower() in ("1", "true", "yes")
+        ).start()
+        context.base_url = context.mock_exchange.base_url
+        context.ws_url = context.mock_exchange.ws_url
     print(f"Environment setup: BASE_URL={context.base_url}, WS_URL={context.ws_url}")
+    # RECORD_TRAFFIC=path logs all REST/WS traffic; REPLAY_TRAFFIC=path serves
+    # the run from such a log (REPLAY_SPEED scales timing, unset = no waits)
+    record_path = os.getenv("RECORD_TRAFFIC")
+    replay_path = os.getenv("REPLAY_TRAFFIC")
+    replay_speed = os.getenv("REPLAY_SPEED")
+    context.recorder = TrafficRecorder(record_path) if record_path else None
+    replay = TrafficReplay(replay_path, float(replay_speed) if replay_speed else None) if replay_path else None
+    # One "now" per run, floored to the minute, for every time-relative request;
+    # it is recorded with the traffic and pinned on replay so queries match
+    context.now_ms = (replay and replay.now_ms) or int(time.time()) // 60 * 60 * 1000
+    if context.recorder is not None:
+        context.recorder.record(RUN_ANCHOR, {"now_ms": context.now_ms})
+    # Keep-alive REST session shared by all scenarios; CANDLE_CACHE_DIR enables
+    # the on-disk candle cache for history pulls
+    cache_dir = os.getenv("CANDLE_CACHE_DIR")
+    cache = CandleCache(cache_dir, max_bytes=int(os.getenv("CANDLE_CACHE_MAX_BYTES", 512 * 1024 * 1024))) if cache_dir else None
+    context.api_client = APIClient(base_url=context.base_url, cache=cache, recorder=context.recorder, replay=replay)
+    # Identical get-candlestick requests within the run share one fetch
+    context.rest_requests = RequestCoalescer(context.api_client)
+    # One shared WebSocket per endpoint for the whole run; retention per channel
+    # is bounded by WS_MAX_FRAMES and optionally WS_MAX_BYTES, and 1 in
+    # WS_SCHEMA_SAMPLE data frames is schema-validated. Dropped sockets are
+    # reopened with jittered backoff (WS_RECONNECT=0 disables, WS_RECONNECT_RETRIES caps)
+    max_bytes = os.getenv("WS_MAX_BYTES")
+    retries = os.getenv("WS_RECONNECT_RETRIES")
+    # BOOK_CAPTURE_DIR streams per-frame top-of-book metrics to Parquet
+    # (BOOK_CAPTURE_FORMAT=arrow|npz; npz when pyarrow is missing), with
+    # cumulative depth over the BOOK_CAPTURE_LEVELS best levels
+    capture_dir = os.getenv("BOOK_CAPTURE_DIR")
+    context.book_capture = BookCapture(
+        capture_dir,
+        format=os.getenv("BOOK_CAPTURE_FORMAT"),
+        levels=[int(n) for n in os.getenv("BOOK_CAPTURE_LEVELS", "5,10").split(",")]
+    ) if capture_dir else None
+    context.ws_pool = WSConnectionPool(
+        max_frames=int(os.getenv("WS_MAX_FRAMES", "10000")),
+        max_bytes=int(max_bytes) if max_bytes else None,
+        schema_sample=int(os.getenv("WS_SCHEMA_SAMPLE", "10")),
+        recorder=context.recorder,
+        replay=replay,
+        reconnect=os.getenv("WS_RECONNECT", "1").lower() not in ("0", "false", "no"),
+        backoff=Backoff(max_retries=int(retries) if retries else None),
+        capture=context.book_capture
+    )
 
 def after_all(context):
+    if context.api_client.cache is not None:
+        print(f"Candle cache: {context.api_client.cache.stats()}")
+    print(f"REST requests: {context.rest_requests.stats()}")
+    context.api_client.close()
+    context.ws_pool.close()
+    if context.book_capture is not None:
+        context.book_capture.close()
+        with open(os.path.join(os.getenv("BOOK_CAPTURE_DIR"), "stats.json"), "w") as f:
+            json.dump(context.book_capture.stats(window_s=None), f, indent=2)
+    if context.recorder is not None:
+        context.recorder.close()
+    if context.mock_exchange is not None:
+        context.mock_exchange.stop()
+    path = metrics_file()
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        metrics.write(path)
+    metrics.stop()
     print("Test run completed.")
 
 def before_scenario(context, scenario):
     print(f"Starting scenario: {scenario.name}")
+    context.metrics_snapshot = metrics.snapshot()
+
+def after_step(context, step):
+    STEP_SECONDS.labels(step.step_type, step.status.name).observe(step.duration)
 
 def after_scenario(context, scenario):
+    summary = metrics.summary_since(context.metrics_snapshot)
+    if summary:
+        allure.attach(summary, name="Metrics", attachment_type=allure.attachment_type.TEXT)
     if scenario.status == "failed":
         print(f"Scenario failed: {scenario.name}")
     else:
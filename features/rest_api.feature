@@ -34,4 +34,12 @@ Feature: REST API: public/get-candlestick
 
   Scenario: TC9 - No parameters provided
     Given REST test input "empty body or query"
-    Then REST expected result should be "TC9 - code != 0 due to missing parameters"
\ No newline at end of file
+    Then REST expected result should be "TC9 - code != 0 due to missing parameters"
+
+  Scenario: TC10 - Coarser timeframes aggregate from 1m candles
+    Given REST test input "instrument_name=BTC_USDT, timeframe=1m"
+    Then REST expected result should be "TC10 - 5m/15m/1h/4h/1D bars match the 1m candles aggregated locally"
+
+  Scenario: TC11 - Instrument x timeframe x range matrix from test_payloads.json
+    Given REST matrix "candlestick_matrix"
+    Then every REST matrix case should pass
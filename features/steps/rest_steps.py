@@ -1,6 +1,5 @@
 
 from behave import given, then
-import requests
 import traceback
 import allure
 import json
@@ -8,8 +7,16 @@ import time
 import re
 import datetime
 
+from tests.utils.api_client import timeframe_ms
+from tests.utils.attachments import ATTACH_PREVIEW_BYTES, AttachmentWriter, attach_text
+from tests.utils.candles import Candles
+from tests.utils.json_codec import loads
+from tests.utils.matrix import expand_matrix, load_payloads
+from tests.utils.resampler import RESAMPLE_TIMEFRAMES, Resampler, diff_bars
+from tests.utils.schema_validator import registry
+
 # === Helper: Parse dynamic time expressions for start/end timestamps ===
-def parse_dynamic_time(expr):
+def parse_dynamic_time(expr, now=None):
 
     def parse_base_time(ts_str):
         try:
@@ -18,7 +25,7 @@ def parse_dynamic_time(expr):
         except ValueError:
             raise ValueError(f"Invalid RELATIVE_TO timestamp format: {ts_str}")
 
-    now = int(time.time() * 1000)
+    now = int(time.time() * 1000) if now is None else now
     is_iso = "_ISO" in expr
     base_time = now
     expr = expr.replace("_ISO", "")
@@ -76,10 +83,12 @@ def parse_dynamic_time(expr):
 def step_given_rest_input(context, input):
     context.params = {}
     input = input.strip()
+    # The run's anchor, so identical requests across scenarios share one fetch
+    now = context.now_ms
 
     # Common input shortcuts
     if input.lower() in ["any valid request", "any request"]:
-        context.params = {"instrument_name": "BTC_USDT", "timeframe": "5m"}
+        context.params = {"instrument_name": "BTC_USDT", "timeframe": "5m", "end": str(now)}
     elif input.lower() in ["empty body or query"]:
         context.params = {}
     else:
@@ -92,41 +101,122 @@ def step_given_rest_input(context, input):
                 continue
 
         # Add end time if not specified
-        context.params["end"] = str(int(time.time() * 1000))
+        context.params["end"] = str(now)
 
     # Parse dynamic time strings for start/end if needed
     for key in ["start", "end"]:
         if key in context.params:
-            context.params[key] = parse_dynamic_time(context.params[key])
+            context.params[key] = parse_dynamic_time(context.params[key], now)
 
     if "instrument_name" not in context.params and "timeframe" in context.params:
         context.params["instrument_name"] = "BTC_USDT"
 
-    # Perform the GET request
-    context.base_url = context.base_url or "https://api.crypto.com/v2"
-    url = f"{context.base_url}/public/get-candlestick"
-    context.response = requests.get(url, params=context.params)
+    # Perform the GET request; identical requests earlier in the run are reused
+    url = f"{context.api_client.base_url}/public/get-candlestick"
+    context.response = context.rest_requests.get_candlestick(**context.params)
 
-    # Attach debug details to Allure
+    # Attach debug details to Allure with a body preview; the full body is
+    # only attached when an assertion on it fails
     allure.attach(
-        f"URL: {url}\nParams: {context.params}\nStatus: {context.response.status_code}",
-        name="Request Details",
-        attachment_type=allure.attachment_type.TEXT
-    )
-
-    allure.attach(
-        f"Request: {url}\nParams: {context.params}\nStatus: {context.response.status_code}\nBody: {context.response.text[:1000]}",
+        f"Request: {url}\nParams: {context.params}\nStatus: {context.response.status_code}\n"
+        f"Body: {context.response.content[:ATTACH_PREVIEW_BYTES].decode(errors='replace')}",
         name="REST API Call",
         attachment_type=allure.attachment_type.TEXT
     )
 
+# === Helper: Rebuild coarser timeframes from one 1m pull and diff them with the server's bars ===
+def check_resampled_timeframes(context, timeframes=RESAMPLE_TIMEFRAMES):
+    instrument_name = context.params.get("instrument_name", "BTC_USDT")
+    # The last complete UTC day, so every timeframe up to 1D has whole bars
+    day_ms = timeframe_ms("1D")
+    end = context.now_ms // day_ms * day_ms - 1
+    start = end + 1 - day_ms
+    candles = context.api_client.iter_candlesticks(instrument_name, "1m", start, end, now_ms=context.now_ms)
+    resampler = Resampler(timeframes).feed_stream(candles)
+    responses = context.api_client.get_candlesticks_bulk([
+        {"instrument_name": instrument_name, "timeframe": tf, "start": start, "end": end, "count": 300}
+        for tf in timeframes
+    ])
+    lines, failures = [f"1m candles pulled: {resampler.fed}"], []
+    for tf, response in zip(timeframes, responses):
+        bars, _ = resampler.bars(tf)
+        report = diff_bars(bars, loads(response.content).get("result", {}).get("data", []))
+        lines.append(f"{tf}: {len(bars)} local bars, {report['compared']} compared, "
+                     f"{len(report['missing'])} missing on server, {len(report['mismatches'])} mismatches")
+        if not report["compared"] or report["mismatches"]:
+            failures.append(f"{tf}: {report['compared']} compared, first mismatches {report['mismatches'][:3]}")
+    allure.attach("\n".join(lines), name="Resampled Timeframes", attachment_type=allure.attachment_type.TEXT)
+    return failures
+
+# === Helper: Check one response against a TC1-TC9 expected-result string ===
+def evaluate_rest_expected(expected, code, body, params):
+    """Return the pass reason for ``expected``; raise AssertionError otherwise."""
+    json_code = body.get("code", None)
+    data = body.get("result", {}).get("data", [])
+    expected_lower = expected.lower()
+
+    if "tc1" in expected_lower:
+        assert code == 200 and json_code == 0, "Expected success response"
+        assert len(data) > 1, "Expected multiple candlestick entries"
+        reason = f"Valid request returned {len(data)} candlesticks"
+
+    elif "tc2" in expected_lower:
+        candles = Candles.from_payload(data)
+        step = timeframe_ms(params["timeframe"])
+        bad = candles.interval_violations(step, tolerance_ms=1000)
+        assert not len(bad), f"Timestamps not {step // 1000}s apart at rows {bad[:10].tolist()}: {candles.t[bad[:10]].tolist()}"
+        reason = f"All {len(candles)} timestamps are spaced ~{step // 1000} seconds apart"
+
+    elif "tc3" in expected_lower:
+        required_keys = {"t", "o", "h", "l", "c", "v"}
+        for i, d in enumerate(data[:5]):
+            assert isinstance(d, dict), f"Candlestick at index {i} is not a dict"
+            assert required_keys.issubset(d.keys()), f"Missing keys in candlestick {i}: {d}"
+        errors = registry.validate_batch("candlestick_item", data)
+        assert not errors, f"{len(errors)} candlesticks fail the schema, first: {errors[0]}"
+        candles = Candles.from_payload(data)
+        bad = candles.ohlc_violations()
+        assert not len(bad), f"OHLC invariants broken at rows {bad[:5].tolist()}"
+        reason = "Candlestick entries have required fields and consistent OHLC values"
+
+    elif "tc4" in expected_lower:
+        assert len(data) <= 5000, f"Data too large: {len(data)} entries"
+        reason = f"Data within 5000 entry limit: {len(data)}"
+
+    elif "tc5" in expected_lower:
+        assert json_code != 0, "Expected error due to missing required parameter"
+        reason = f"API returned error as expected: JSON Code {json_code}"
+
+    elif "tc6" in expected_lower:
+        start = int(params.get("start", 0))
+        end = int(params.get("end", 1e20))
+        candles = Candles.from_payload(data)
+        bad = candles.range_violations(start, end)
+        assert not len(bad), f"Timestamps out of range: {candles.t[bad[:5]].tolist()}"
+        reason = f"All timestamps within range: {start} ~ {end}"
+
+    elif "tc7" in expected_lower:
+        assert json_code != 0, f"Expected error for invalid instrument name, got code=0"
+        reason = f"Invalid instrument_name correctly returned error code: {json_code}"
+
+    elif "tc8" in expected_lower:
+        assert json_code != 0, f"Expected error for invalid timeframe format, got code=0"
+        reason = f"Invalid timeframe format correctly returned error code: {json_code}"
+
+    elif "tc9" in expected_lower:
+        assert json_code != 0, f"Expected error for missing parameters, got code=0"
+        reason = f"Missing parameters correctly returned error code: {json_code}"
+
+    else:
+        reason = f"Condition met (HTTP {code}, Code {json_code})"
+    return reason
+
 # === Then Step: Validate response based on expected TC keywords ===
 @then('REST expected result should be "{expected}"')
 def step_then_rest_expected(context, expected):
     code = context.response.status_code
-    body = context.response.json()
+    body = loads(context.response.content)
     json_code = body.get("code", None)
-    data = body.get("result", {}).get("data", [])
     expected_lower = expected.lower()
 
     logcat_lines = [
@@ -134,58 +224,17 @@ def step_then_rest_expected(context, expected):
         f"- Expected: {expected}",
         f"- HTTP Status: {code}",
         f"- JSON Code: {json_code}",
-        f"- Response Body: {context.response.text[:300]}"
+        f"- Response Body: {context.response.content[:300].decode(errors='replace')}"
     ]
     allure.attach("\n".join(logcat_lines), name="REST Assertion Evaluation", attachment_type=allure.attachment_type.TEXT)
 
     try:
-        if "tc1" in expected_lower:
-            assert code == 200 and json_code == 0, "Expected success response"
-            assert len(data) > 1, "Expected multiple candlestick entries"
-            reason = f"Valid request returned {len(data)} candlesticks"
-
-        elif "tc2" in expected_lower:
-            timestamps = [int(d["t"]) for d in data[:10]]
-            diffs = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
-            assert all(abs(diff - 60000) <= 1000 for diff in diffs), f"Timestamps not 1-min apart: {diffs}"
-            reason = "Timestamps are spaced ~60 seconds apart"
-
-        elif "tc3" in expected_lower:
-            required_keys = {"t", "o", "h", "l", "c", "v"}
-            for i, d in enumerate(data[:5]):
-                assert isinstance(d, dict), f"Candlestick at index {i} is not a dict"
-                assert required_keys.issubset(d.keys()), f"Missing keys in candlestick {i}: {d}"
-            reason = "Candlestick entries have required fields"
-
-        elif "tc4" in expected_lower:
-            assert len(data) <= 5000, f"Data too large: {len(data)} entries"
-            reason = f"Data within 5000 entry limit: {len(data)}"
-
-        elif "tc5" in expected_lower:
-            assert json_code != 0, "Expected error due to missing required parameter"
-            reason = f"API returned error as expected: JSON Code {json_code}"
-
-        elif "tc6" in expected_lower:
-            start = int(context.params.get("start", 0))
-            end = int(context.params.get("end", 1e20))
-            timestamps = [int(d["t"]) for d in data]
-            assert all(start <= ts <= end for ts in timestamps), f"Timestamps out of range: {timestamps[:5]}"
-            reason = f"All timestamps within range: {start} ~ {end}"
-
-        elif "tc7" in expected_lower:
-            assert json_code != 0, f"Expected error for invalid instrument name, got code=0"
-            reason = f"Invalid instrument_name correctly returned error code: {json_code}"
-
-        elif "tc8" in expected_lower:
-            assert json_code != 0, f"Expected error for invalid timeframe format, got code=0"
-            reason = f"Invalid timeframe format correctly returned error code: {json_code}"
-
-        elif "tc9" in expected_lower:
-            assert json_code != 0, f"Expected error for missing parameters, got code=0"
-            reason = f"Missing parameters correctly returned error code: {json_code}"
-
+        if "tc10" in expected_lower:
+            failures = check_resampled_timeframes(context)
+            assert not failures, f"Server bars differ from 1m aggregation: {failures}"
+            reason = f"{', '.join(RESAMPLE_TIMEFRAMES)} bars match the aggregated 1m candles"
         else:
-            reason = f"Condition met (HTTP {code}, Code {json_code})"
+            reason = evaluate_rest_expected(expected, code, body, context.params)
 
         allure.attach(
             f"[PASS] Assertion Passed\nReason: {reason}",
@@ -199,4 +248,36 @@ def step_then_rest_expected(context, expected):
             name="REST Assertion Error",
             attachment_type=allure.attachment_type.TEXT
         )
+        # Streamed in under ATTACH_MAX_BYTES
+        attach_text(context.response.content, name="REST Response Body")
         raise
+
+# === Given Step: Expand a test_payloads.json matrix and fetch each unique request once ===
+@given('REST matrix "{name}"')
+def step_given_rest_matrix(context, name):
+    now = context.now_ms
+    context.matrix_cases = expand_matrix(load_payloads()[name], lambda expr: parse_dynamic_time(expr, now))
+    fetched = context.rest_requests.fetched
+    context.matrix_responses = context.rest_requests.get_many([case["params"] for case in context.matrix_cases])
+    allure.attach(
+        f"Matrix: {name}\nCases: {len(context.matrix_cases)}\nRequests sent: {context.rest_requests.fetched - fetched}",
+        name="REST Matrix",
+        attachment_type=allure.attachment_type.TEXT
+    )
+
+# === Then Step: Fan each response out to every expected result of its case ===
+@then('every REST matrix case should pass')
+def step_then_rest_matrix(context):
+    checks, failures = 0, []
+    with AttachmentWriter("REST Matrix Results") as writer:
+        for case, response in zip(context.matrix_cases, context.matrix_responses):
+            body = loads(response.content)
+            for expected in case["expected"]:
+                checks += 1
+                try:
+                    reason = evaluate_rest_expected(expected, response.status_code, body, case["params"])
+                    writer.write(f"[PASS] {case['name']} | {expected}: {reason}\n")
+                except AssertionError as e:
+                    failures.append(f"{case['name']} | {expected}: {e}")
+                    writer.write(f"[FAIL] {failures[-1]}\n")
+    assert not failures, f"{len(failures)} of {checks} matrix checks failed, first: {failures[:3]}"
@@ -1,22 +1,18 @@
 
-from behave import given, then
-import websocket
+from behave import given, then, when
 import json
-import threading
-import time
 import traceback
 import allure
 
+from tests.utils.attachments import attach_frames
+from tests.utils.order_book import OrderBook
+from tests.utils.schema_validator import registry
+
 # Helper: Check if WebSocket response contains any error
 def is_error_response(context):
-    timeout = time.time() + 5
-    while time.time() < timeout:
-        if context.ws_error:
-            return True
-        for m in context.ws_messages:
-            if "error" in m or m.get("code", 0) != 0:
-                return True
-        time.sleep(0.5)
+    error_frame = context.ws_cursor.wait_for(lambda m: "error" in m or m.get("code", 0) != 0, timeout=5)
+    if error_frame or context.ws_cursor.error:
+        return True
     for m in context.ws_messages:
         if "result" in m and m["result"].get("status") == "success":
             has_data_push = any(
@@ -58,48 +54,60 @@ def step_given_ws_input(context, input):
         if context.params["instrument_name"] not in allowed_symbols:
             raise ValueError(f"Unsupported instrument_name: {context.params['instrument_name']}. Allowed: {allowed_symbols}")
 
-    context.ws_messages = []
-    context.ws_error = None
-    context.ws_closed = False
-
-    def on_message(ws, message):
-        context.ws_messages.append(json.loads(message))
-
-    def on_open(ws):
-        subscription = {
-            "method": "subscribe",
-            "params": {
-                "channels": [f"book.{context.params['instrument_name']}.{context.params['depth']}"]
-            },
-            "id": 1
-        }
-        ws.send(json.dumps(subscription))
-        allure.attach(json.dumps(subscription, indent=2), name="Sent Subscription", attachment_type=allure.attachment_type.JSON)
-
-    def on_error(ws, error):
-        context.ws_error = str(error)
-
-    def on_close(ws, *_):
-        context.ws_closed = True
-
-    context.ws = websocket.WebSocketApp(
-        context.ws_url,
-        on_message=on_message,
-        on_open=on_open,
-        on_error=on_error,
-        on_close=on_close
-    )
-
-    thread = threading.Thread(target=context.ws.run_forever)
-    thread.daemon = True
-    thread.start()
-
-    timeout = 20
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        if context.ws_messages or context.ws_error:
-            break
-        time.sleep(0.5)
+    # Reuse the session's shared socket; only the first scenario per channel subscribes
+    channel = f"book.{context.params['instrument_name']}.{context.params['depth']}"
+    context.ws_cursor = context.ws_pool.subscribe(context.ws_url, channel)
+    context.ws_messages = context.ws_cursor
+    allure.attach(json.dumps(context.ws_cursor.request, indent=2), name="Sent Subscription", attachment_type=allure.attachment_type.JSON)
+
+    # Wait for the first frame (ack, snapshot or error) instead of polling
+    context.ws_cursor.wait_for(lambda m: True, timeout=20)
+
+# When Step: Drop the shared socket and wait until the channel is resumed on a new one
+@when('the WS connection drops and resumes')
+def step_when_ws_drops(context):
+    cursor = context.ws_cursor
+    cursor.wait_for(lambda m: "data" in (m.get("result") or {}), timeout=20)
+    old_id = cursor.request["id"]
+    if not cursor.connection.drop():
+        allure.attach("Connection does not reconnect; nothing dropped", name="WS Drop", attachment_type=allure.attachment_type.TEXT)
+        return
+    resumed = []
+
+    def after_resume(m):
+        # The resubscription ack, then the first data frame on the new socket
+        if not resumed:
+            if m.get("id") not in (None, old_id):
+                resumed.append(m)
+            return False
+        return "data" in (m.get("result") or {})
+
+    frame = cursor.wait_for(after_resume, timeout=30)
+    assert frame, f"Channel not resumed after drop (resubscribe ack: {resumed[:1]})"
+
+# Given Step: Let a shared channel run warm before the scenario's own cursor attaches
+@given('WS channel "{channel}" has streamed {count:d} book frames')
+def step_given_ws_warm_channel(context, channel, count):
+    cursor = context.ws_pool.subscribe(context.ws_url, channel)
+    seen = []
+
+    def counted(m):
+        if "data" in (m.get("result") or {}):
+            seen.append(m)
+        return len(seen) >= count
+
+    frame = cursor.wait_for(counted, timeout=count + 20)
+    cursor.close()
+    assert frame, f"Only {len(seen)} of {count} book frames on {channel}"
+
+# Helper: Rebuild the order book from every book frame received so far
+def replay_book(context):
+    book = OrderBook(context.params["instrument_name"], int(context.params["depth"]))
+    for m in context.ws_messages:
+        result = m.get("result") or {}
+        if result.get("channel") in ("book", "book.update") and result.get("data"):
+            book.apply(result)
+    return book
 
 # === Assertions ===
 
@@ -107,27 +115,26 @@ def assert_ws_tc1_subscription(context):
     assert any("result" in m or "method" in m for m in context.ws_messages), "No subscription confirmation found"
 
 def assert_ws_tc2_orderbook_present(context):
-    book_data = None
-    end_time = time.time() + 20
-    while time.time() < end_time:
-        for m in context.ws_messages:
-            if "result" in m and "data" in m["result"]:
-                data = m["result"]["data"]
-                if isinstance(data, list) and data:
-                    book_data = data[0]
-                    break
-        if book_data:
-            break
-        time.sleep(0.5)
+    def has_book_data(m):
+        data = m.get("result", {}).get("data") if "result" in m else None
+        return isinstance(data, list) and len(data) > 0
+
+    frame = context.ws_cursor.wait_for(has_book_data, timeout=20)
+    book_data = frame["result"]["data"][0] if frame else None
     if not book_data:
-        allure.attach(json.dumps(context.ws_messages, indent=2), name="All WS Messages", attachment_type=allure.attachment_type.JSON)
+        # Streamed straight from the retained raw frames, capped at ATTACH_MAX_BYTES
+        attach_frames(context.ws_cursor.raw(), name="All WS Messages")
     assert book_data, "No orderbook data with bids/asks found"
+    context.book_frame = frame
     context.book_data = book_data
 
 def assert_ws_tc3_validate_format(context):
     if not hasattr(context, 'book_data'):
         assert_ws_tc2_orderbook_present(context)
     book_data = context.book_data
+    registry.validate("book_snapshot", context.book_frame["result"])
+    failures = context.ws_cursor.stream.schema_failures()
+    assert not failures, f"Sampled book frames failed schema validation: {failures[:3]}"
     assert isinstance(book_data.get("t", 0), int)
     assert all(isinstance(float(bid[0]), float) for bid in book_data.get("bids", []))
     assert all(isinstance(float(ask[0]), float) for ask in book_data.get("asks", []))
@@ -138,15 +145,17 @@ def assert_ws_tc4_error_expected(context):
 def assert_ws_tc5_depth_limit(context):
     if not hasattr(context, 'book_data'):
         assert_ws_tc2_orderbook_present(context)
-    book_data = context.book_data
-    assert len(book_data["bids"]) <= int(context.params["depth"])
-    assert len(book_data["asks"]) <= int(context.params["depth"])
+    book = replay_book(context)
+    depth = int(context.params["depth"])
+    assert book.max_levels <= depth, f"Book exceeded depth {depth} with {book.max_levels} levels over {book.updates} frames"
 
 def assert_ws_tc6_bid_ask_not_empty(context):
     if not hasattr(context, 'book_data'):
         assert_ws_tc2_orderbook_present(context)
-    book_data = context.book_data
-    assert len(book_data["bids"]) > 0 and len(book_data["asks"]) > 0, "Bid or ask list is empty"
+    book = replay_book(context)
+    assert book.updates > 0, "No book frames to replay"
+    assert book.empty == 0, f"Bid or ask side empty in {book.empty} of {book.updates} frames"
+    assert book.crossed == 0, f"Crossed book in {book.crossed} of {book.updates} frames"
 
 def assert_ws_tc7_price_quantity_type(context):
     if not hasattr(context, 'book_data'):
@@ -160,16 +169,21 @@ def assert_ws_tc7_price_quantity_type(context):
         assert isinstance(float(ask[1]), float)
 
 def assert_ws_tc8_timestamp_monotonic(context):
-    timestamps = []
+    # Stream over the retained window; frames are decoded one at a time
+    last = None
     for m in context.ws_messages:
         if "result" in m and "data" in m["result"]:
             for entry in m["result"]["data"]:
-                timestamps.append(entry.get("t"))
-    assert all(timestamps[i] <= timestamps[i+1] for i in range(len(timestamps)-1)), "Timestamps not monotonic"
+                ts = entry.get("t")
+                assert last is None or last <= ts, f"Timestamps not monotonic: {last} > {ts}"
+                last = ts
 
 def assert_ws_tc9_duplicate_subscription(context):
-    ids = [m.get("id") for m in context.ws_messages if "id" in m]
-    assert len(ids) == len(set(ids)), "Duplicate subscription IDs detected"
+    seen = set()
+    for m in context.ws_messages:
+        if "id" in m:
+            assert m["id"] not in seen, f"Duplicate subscription ID detected: {m['id']}"
+            seen.add(m["id"])
 
 # Then Step: Run assertions based on expected tag
 @then('WS expected result should be "{expected}"')
@@ -179,7 +193,7 @@ def step_then_ws_expected(context, expected):
         "WebSocket Assertion Evaluation:",
         f"- Expected: {expected}",
         f"- Message Count: {len(context.ws_messages)}",
-        f"- Error: {context.ws_error}",
+        f"- Error: {context.ws_cursor.error}",
         f"- First Message: {json.dumps(context.ws_messages[:1], indent=2) if context.ws_messages else 'None'}"
     ]
     allure.attach("\n".join(logcat_lines), name="WS Assertion Evaluation", attachment_type=allure.attachment_type.TEXT)
@@ -212,5 +226,4 @@ def step_then_ws_expected(context, expected):
         raise
 
     finally:
-        if context.ws:
-            context.ws.close()
+        context.ws_cursor.close()
@@ -38,3 +38,13 @@ Feature: WebSocket Book Channel Tests
   Scenario: WS-TC9 - Validate no duplicate subscription IDs
     Given WS test input "book.BTC_USDT.10"
     Then WS expected result should be "TC9"
+
+  Scenario: WS-TC10 - Validate TC1-TC9 across a reconnect
+    Given WS test input "ETH_USDT, depth=10"
+    When the WS connection drops and resumes
+    Then WS expected result should be "TC1 TC2 TC3 TC5 TC6 TC7 TC8 TC9"
+
+  Scenario: WS-TC11 - Validate a late subscriber to a warm channel
+    Given WS channel "book.CRO_USDT.10" has streamed 30 book frames
+    And WS test input "CRO_USDT, depth=10"
+    Then WS expected result should be "TC2 TC3 TC5 TC6 TC7"
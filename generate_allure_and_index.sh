@@ -5,9 +5,9 @@ timestamp=$(date +%Y%m%d_%H%M%S)
 output_dir="reports/allure-results"
 report_dir="docs/$timestamp"
 
-# 1. Run behave and generate raw results
+# 1. Run behave in parallel workers and merge their raw results
 echo "🎯 Running behave..."
-behave -f allure_behave.formatter:AllureFormatter -o "$output_dir"
+python3 scripts/run_parallel.py -o "$output_dir" --clean
 
 # 2. Generate HTML report
 echo "📊 Generating Allure HTML to $report_dir..."
@@ -1,18 +1,136 @@
-import os
+import argparse
 import json
+import os
+import sys
 from datetime import datetime
 
 REPORTS_DIR = "docs"
-index_file_path = os.path.join(REPORTS_DIR, "index.html")
+MANIFEST_FILE = "manifest.json"
+TREND_FILE = "trend.json"
+PAGES_DIR = "runs"
+PAGE_SIZE = 50
+MANIFEST_VERSION = 1
+
+
+# === Manifest: one summary per run directory, read from disk only once ===
+def run_directories(reports_dir):
+    # Names only; summaries of known runs come from the manifest
+    entries = []
+    for d in os.listdir(reports_dir):
+        if not d.startswith("202") or not os.path.isdir(os.path.join(reports_dir, d)):
+            continue
+        try:
+            datetime.strptime(d, "%Y%m%d_%H%M%S")
+        except ValueError:
+            continue
+        entries.append(d)
+    entries.sort()
+    return entries
+
+
+def read_summary(reports_dir, entry):
+    run = {"id": entry, "total": None, "passed": None, "failed": None, "broken": None, "duration_ms": None}
+    summary_path = os.path.join(reports_dir, entry, "widgets", "summary.json")
+    try:
+        with open(summary_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return run
+    statistic = data.get("statistic", {})
+    for key in ("total", "passed", "failed", "broken"):
+        run[key] = statistic.get(key)
+    run["duration_ms"] = data.get("time", {}).get("duration")
+    return run
+
+
+def load_manifest(path, page_size):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("page_size") != page_size:
+        return []
+    return manifest.get("runs", [])
+
+
+def update_runs(reports_dir, known, entries):
+    """Merge ``known`` manifest runs with the run directories on disk.
+
+    Returns the runs in chronological order and the index of the first run
+    that differs from ``known`` (``len(runs)`` when nothing changed).
+    """
+    by_id = {run["id"]: run for run in known}
+    runs = []
+    for entry in entries:
+        run = by_id.get(entry)
+        if run is None or run["total"] is None:
+            # Summaries missing or unreadable last time are read again
+            run = read_summary(reports_dir, entry)
+        runs.append(run)
+    first_changed = len(runs)
+    for i, run in enumerate(runs):
+        if i >= len(known) or known[i] != run:
+            first_changed = i
+            break
+    if len(known) > len(runs):
+        first_changed = min(first_changed, len(runs))
+    return runs, first_changed
 
-entries = [
-    d for d in os.listdir(REPORTS_DIR)
-    if os.path.isdir(os.path.join(REPORTS_DIR, d)) and d.startswith("202")
-]
-entries.sort(reverse=True)
+
+# === Outputs ===
+def write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def write_pages(reports_dir, runs, first_changed, page_size):
+    """Chronological pages of ``page_size`` runs; only pages from the first change on are rewritten."""
+    pages_dir = os.path.join(reports_dir, PAGES_DIR)
+    os.makedirs(pages_dir, exist_ok=True)
+    page_count = (len(runs) + page_size - 1) // page_size
+    written = 0
+    start = page_count if first_changed >= len(runs) else first_changed // page_size
+    for page in range(start, page_count):
+        write_json(os.path.join(pages_dir, f"page-{page}.json"), runs[page * page_size:(page + 1) * page_size])
+        written += 1
+    # Pages past the end are left over from removed runs
+    page = page_count
+    while os.path.exists(os.path.join(pages_dir, f"page-{page}.json")):
+        os.remove(os.path.join(pages_dir, f"page-{page}.json"))
+        page += 1
+    return written
+
+
+def trend(runs):
+    # Columnar so the dashboard can plot straight from the arrays
+    return {key: [run[key] for run in runs] for key in ("id", "total", "passed", "failed", "broken", "duration_ms")}
+
+
+def run_item(run, latest=False):
+    pretty_time = datetime.strptime(run["id"], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M")
+    badge_latest = '<span class="badge bg-success badge-latest">Latest</span>' if latest else ""
+
+    def stat(value):
+        return "?" if value is None else value
+
+    return f'''  <li class="list-group-item d-flex justify-content-between align-items-center report-link">
+    <div class="d-flex align-items-center">
+        <a href="{run["id"]}/index.html" class="text-decoration-none">{pretty_time}</a>
+        {badge_latest}
+    </div>
+    <div>
+        <span class="badge bg-secondary badge-space">Total: {stat(run["total"])}</span>
+        <span class="badge bg-success badge-space">Passed: {stat(run["passed"])}</span>
+        <span class="badge bg-danger badge-space">Failed: {stat(run["failed"])}</span>
+    </div>
+  </li>
+'''
 
 
-html = """<!DOCTYPE html>
+HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -24,6 +142,8 @@ html = """<!DOCTYPE html>
         .report-link:hover { background-color: #e2e6ea; }
         .badge-space { margin-left: 10px; }
         .badge-latest { margin-left: 8px; }
+        #trend rect.passed { fill: #198754; }
+        #trend rect.failed { fill: #dc3545; }
     </style>
 </head>
 <body>
@@ -32,53 +152,105 @@ html = """<!DOCTYPE html>
             <img src="https://upload.wikimedia.org/wikipedia/en/b/b0/Crypto.com_logo.svg" width="500" style="margin-bottom: 10px;">
         </div>
         <h1 class="mb-4 text-center">Available Test Reports</h1>
-        <ul class="list-group">
+        <svg id="trend" class="mb-3" width="100%" height="80" preserveAspectRatio="none"></svg>
+        <ul class="list-group" id="runs">
 """
 
-
-for i, entry in enumerate(entries):
-    dt = datetime.strptime(entry, "%Y%m%d_%H%M%S")
-    pretty_time = dt.strftime("%Y-%m-%d %H:%M")
-    report_path = os.path.join(REPORTS_DIR, entry)
-    summary_path = os.path.join(report_path, "widgets", "summary.json")
-
-    passed = failed = total = "?"
-    if os.path.exists(summary_path):
-        with open(summary_path) as f:
-            try:
-                data = json.load(f)
-                total = data.get("statistic", {}).get("total", "?")
-                passed = data.get("statistic", {}).get("passed", "?")
-                failed = data.get("statistic", {}).get("failed", "?")
-            except:
-                pass
-
-    badge_latest = '<span class="badge bg-success badge-latest">Latest</span>' if i == 0 else ""
-    badge_stats = f"""
-        <span class="badge bg-secondary badge-space">Total: {total}</span>
-        <span class="badge bg-success badge-space">Passed: {passed}</span>
-        <span class="badge bg-danger badge-space">Failed: {failed}</span>
-    """
-
-    html += f'''  <li class="list-group-item d-flex justify-content-between align-items-center report-link">
-    <div class="d-flex align-items-center">
-        <a href="{entry}/index.html" class="text-decoration-none">{pretty_time}</a>
-        {badge_latest}
+# Older runs are fetched page by page from runs/page-N.json, newest first
+HTML_TAIL = """    </ul>
+        <div class="text-center mt-3">
+            <button id="more" class="btn btn-outline-secondary" style="display: none;">Load older reports</button>
+        </div>
+        <p class="text-muted mt-4 text-center">Generated by GitHub Actions</p>
     </div>
-    <div>{badge_stats}</div>
-  </li>
-'''
+    <script>
+    const PAGE_SIZE = __PAGE_SIZE__;
+    let next = __NEXT__;
+    const list = document.getElementById("runs");
+    const more = document.getElementById("more");
+    const stat = v => v === null ? "?" : v;
 
+    function item(run) {
+        const t = run.id;
+        const pretty = `${t.slice(0, 4)}-${t.slice(4, 6)}-${t.slice(6, 8)} ${t.slice(9, 11)}:${t.slice(11, 13)}`;
+        const li = document.createElement("li");
+        li.className = "list-group-item d-flex justify-content-between align-items-center report-link";
+        li.innerHTML = `<div class="d-flex align-items-center"><a href="${run.id}/index.html" class="text-decoration-none">${pretty}</a></div>
+            <div><span class="badge bg-secondary badge-space">Total: ${stat(run.total)}</span>
+            <span class="badge bg-success badge-space">Passed: ${stat(run.passed)}</span>
+            <span class="badge bg-danger badge-space">Failed: ${stat(run.failed)}</span></div>`;
+        return li;
+    }
 
+    async function loadOlder() {
+        more.disabled = true;
+        const page = Math.floor(next / PAGE_SIZE);
+        const runs = await (await fetch(`runs/page-${page}.json`)).json();
+        for (; next >= page * PAGE_SIZE; next--) {
+            list.appendChild(item(runs[next - page * PAGE_SIZE]));
+        }
+        more.disabled = false;
+        more.style.display = next >= 0 ? "" : "none";
+    }
 
-html += """    </ul>
-        <p class="text-muted mt-4 text-center">Generated by GitHub Actions</p>
-    </div>
+    async function drawTrend() {
+        const data = await (await fetch("trend.json")).json();
+        const svg = document.getElementById("trend");
+        const n = Math.min(data.id.length, 100), first = data.id.length - n;
+        const top = Math.max(1, ...data.total.slice(first).map(v => v || 0));
+        let bars = "";
+        for (let i = 0; i < n; i++) {
+            const passed = data.passed[first + i] || 0, failed = (data.failed[first + i] || 0) + (data.broken[first + i] || 0);
+            const hp = 80 * passed / top, hf = 80 * failed / top;
+            bars += `<rect class="passed" x="${i}" width="0.8" y="${80 - hp}" height="${hp}"><title>${data.id[first + i]}</title></rect>`;
+            bars += `<rect class="failed" x="${i}" width="0.8" y="${80 - hp - hf}" height="${hf}"></rect>`;
+        }
+        svg.setAttribute("viewBox", `0 0 ${Math.max(n, 1)} 80`);
+        svg.innerHTML = bars;
+    }
+
+    more.addEventListener("click", loadOlder);
+    more.style.display = next >= 0 ? "" : "none";
+    drawTrend();
+    </script>
 </body>
 </html>
 """
 
-with open(index_file_path, "w") as f:
-    f.write(html)
 
-print(f"[✓] Enhanced index.html with stats written to {index_file_path}")
+def render_index(runs, page_size):
+    # Only the newest page is inlined; the rest loads on demand
+    latest = runs[::-1][:page_size]
+    parts = [HTML_HEAD]
+    parts.extend(run_item(run, latest=i == 0) for i, run in enumerate(latest))
+    parts.append(HTML_TAIL.replace("__PAGE_SIZE__", str(page_size)).replace("__NEXT__", str(len(runs) - len(latest) - 1)))
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the report dashboard from new Allure run directories")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and re-read every run")
+    args = parser.parse_args()
+
+    reports_dir = args.reports_dir
+    manifest_path = os.path.join(reports_dir, MANIFEST_FILE)
+    known = [] if args.rebuild else load_manifest(manifest_path, args.page_size)
+    runs, first_changed = update_runs(reports_dir, known, run_directories(reports_dir))
+    new_runs = len(runs) - len(set(run["id"] for run in known) & set(run["id"] for run in runs))
+
+    pages = write_pages(reports_dir, runs, first_changed, args.page_size)
+    write_json(os.path.join(reports_dir, TREND_FILE), trend(runs))
+    write_json(manifest_path, {"version": MANIFEST_VERSION, "page_size": args.page_size, "runs": runs})
+
+    index_file_path = os.path.join(reports_dir, "index.html")
+    with open(index_file_path, "w") as f:
+        f.write(render_index(runs, args.page_size))
+
+    print(f"[✓] index.html written to {index_file_path}: {len(runs)} runs ({new_runs} new), {pages} pages rewritten")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tests.utils.candles import Candles
+from tests.utils.json_codec import available_backends, typed_decoder
+from tests.utils.mock_exchange import MockExchange, SyntheticBook
+from tests.utils.order_book import OrderBook
+from tests.utils.recorder import REST_RESPONSE, WS_FRAME, TrafficLog
+
+
+def recorded_payloads(path):
+    """Book frames and candlestick bodies from a RECORD_TRAFFIC log."""
+    book, candles = [], []
+    for record in TrafficLog(path).records(kinds={WS_FRAME, REST_RESPONSE}):
+        if record.kind == WS_FRAME and (record.meta.get("channel") or "").startswith("book."):
+            # Data frames only; acks and errors have no book to decode
+            if "data" in (json.loads(record.body).get("result") or {}):
+                book.append(record.body)
+        elif record.kind == REST_RESPONSE and "get-candlestick" in record.meta["key"] and record.meta["status"] == 200:
+            candles.append(record.body)
+    return book, candles
+
+
+def synthetic_payloads(frames, depth):
+    # Same shapes the mock exchange serves, without starting its servers
+    book = SyntheticBook("BTC_USDT", depth, seed=1)
+    book_frames = [json.dumps({"method": "subscribe", "result": {
+        "instrument_name": "BTC_USDT", "subscription": f"book.BTC_USDT.{depth}", "channel": "book",
+        "depth": depth, "data": [book.next(1_700_000_000_000 + i)]}}).encode() for i in range(frames)]
+    exchange = MockExchange()
+    candle_bodies = [json.dumps(exchange.candlestick_response(
+        {"instrument_name": "BTC_USDT", "timeframe": "1m", "count": "300", "end": str(1_700_000_000_000 - i * 60_000)}
+    )[1]).encode() for i in range(max(1, frames // 20))]
+    return book_frames, candle_bodies
+
+
+def timed(fn, payloads, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    size = sum(len(p) for p in payloads)
+    return {"us_per_payload": round(best / len(payloads) * 1e6, 3), "mb_per_s": round(size / best / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON decode backends on book frames and candle bodies")
+    parser.add_argument("--log", help="RECORD_TRAFFIC log to take payloads from (default: synthetic)")
+    parser.add_argument("-n", "--frames", type=int, default=2000, help="synthetic book frames")
+    parser.add_argument("-d", "--depth", type=int, default=50)
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="best of N passes")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    book_frames, candle_bodies = recorded_payloads(args.log) if args.log else synthetic_payloads(args.frames, args.depth)
+    if not book_frames or not candle_bodies:
+        parser.error("need at least one book frame and one candlestick response")
+    print(f"📦 {len(book_frames)} book frames, {len(candle_bodies)} candlestick bodies")
+
+    cases = {}
+    for name, loads in available_backends().items():
+        cases[f"book/{name}"] = (book_frames, loads)
+        cases[f"candles/{name}"] = (candle_bodies, loads)
+
+        def book_pipeline(raw, loads=loads):
+            OrderBook().apply(loads(raw)["result"])
+
+        cases[f"book+orderbook/{name}"] = (book_frames, book_pipeline)
+        cases[f"candles+columns/{name}"] = (candle_bodies, lambda raw, loads=loads: Candles.from_payload(loads(raw)))
+    typed_book, typed_candles = typed_decoder("book"), typed_decoder("candlestick")
+    if typed_book is not None:
+        cases["book/typed"] = (book_frames, typed_book)
+        cases["candles/typed"] = (candle_bodies, typed_candles)
+        cases["book+orderbook/typed"] = (book_frames, lambda raw: OrderBook().apply(typed_book(raw).result))
+        cases["candles+columns/typed"] = (candle_bodies, Candles.from_raw)
+    else:
+        print("msgspec not installed; skipping typed structs")
+
+    results = {name: timed(fn, payloads, args.repeat) for name, (payloads, fn) in cases.items()}
+    for name, result in results.items():
+        print(f"{name:<28} {result['us_per_payload']:>10.3f} us  {result['mb_per_s']:>8.2f} MB/s")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tests.utils.api_client import APIClient
+from tests.utils.histogram import Histogram
+from tests.utils.json_codec import DecodeError, loads
+from tests.utils.mock_exchange import MockExchange
+
+DEFAULT_OUTPUT = "reports/load"
+
+
+class TargetStats:
+    """Latency/size histograms and outcome counts for one instrument/timeframe."""
+
+    def __init__(self):
+        self.latency_us = Histogram()
+        self.service_us = Histogram()
+        self.payload_bytes = Histogram()
+        self.codes = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, latency_us, service_us, size, code):
+        with self.lock:
+            self.latency_us.record(latency_us)
+            self.service_us.record(service_us)
+            if size is not None:
+                self.payload_bytes.record(size)
+            self.codes[code] += 1
+
+    def summary(self):
+        total = sum(self.codes.values())
+        errors = total - self.codes.get("0", 0)
+        return {
+            "requests": total,
+            "error_rate": round(errors / total, 4) if total else None,
+            "codes": dict(self.codes),
+            "latency_ms": self.latency_us.summary(scale=1000),
+            "service_ms": self.service_us.summary(scale=1000),
+            "payload_bytes": self.payload_bytes.summary(),
+        }
+
+
+def outcome(response):
+    # The exchange's JSON ``code``; transport-level failures get an http_ label
+    try:
+        return str(loads(response.content).get("code")), len(response.content)
+    except DecodeError:
+        return f"http_{response.status_code}", len(response.content)
+
+
+def call(client, stats, instrument_name, timeframe, intended):
+    started = time.perf_counter()
+    try:
+        response = client.get_candlestick(instrument_name, timeframe)
+        code, size = outcome(response)
+    except Exception as e:
+        code, size = type(e).__name__, None
+    done = time.perf_counter()
+    # Latency runs from the scheduled send time, so a stalled server also
+    # charges the requests that queued behind it (no coordinated omission)
+    stats.record((done - intended) * 1e6, (done - started) * 1e6, size, code)
+
+
+def run_open_loop(client, targets, stats, rate, duration, poisson):
+    """Issue requests on a fixed schedule, whether or not earlier ones finished."""
+    executor = client.pool()
+    rnd = random.Random()
+    start = time.perf_counter()
+    due = start
+    futures = []
+    for instrument_name, timeframe in itertools.cycle(targets):
+        due += rnd.expovariate(rate) if poisson else 1.0 / rate
+        if due - start >= duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        futures.append(executor.submit(call, client, stats[(instrument_name, timeframe)],
+                                       instrument_name, timeframe, due))
+    for future in futures:
+        future.result()
+
+
+def run_closed_loop(client, targets, stats, concurrency, duration):
+    """``concurrency`` workers, each sending its next request when the last returns."""
+    deadline = time.perf_counter() + duration
+    cycle = itertools.cycle(targets)
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                instrument_name, timeframe = next(cycle)
+            call(client, stats[(instrument_name, timeframe)], instrument_name, timeframe, time.perf_counter())
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def export(output_dir, config, stats, elapsed):
+    os.makedirs(output_dir, exist_ok=True)
+    overall = TargetStats()
+    for target in stats.values():
+        overall.latency_us.merge(target.latency_us)
+        overall.service_us.merge(target.service_us)
+        overall.payload_bytes.merge(target.payload_bytes)
+        overall.codes.update(target.codes)
+    report = {
+        "config": config,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(sum(overall.codes.values()) / elapsed, 2),
+        "overall": overall.summary(),
+        "targets": {f"{inst} {tf}": target.summary() for (inst, tf), target in stats.items()},
+    }
+    with open(os.path.join(output_dir, "rest_load.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    # Full bucket data so runs can be merged or re-plotted later
+    with open(os.path.join(output_dir, "rest_load_histograms.json"), "w") as f:
+        json.dump({f"{inst} {tf}": target.latency_us.to_dict() for (inst, tf), target in stats.items()}, f)
+    return report
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Load-test public/get-candlestick")
+    parser.add_argument("--base-url", default=os.getenv("BASE_URL"))
+    parser.add_argument("--mock", action="store_true", help="load the in-process mock exchange")
+    parser.add_argument("-i", "--instruments", nargs="+", default=["BTC_USDT", "ETH_USDT"])
+    parser.add_argument("-f", "--timeframes", nargs="+", default=["1m", "1h"])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("-r", "--rate", type=float, default=20.0, help="open-loop requests/s (default)")
+    mode.add_argument("-c", "--concurrency", type=int, help="closed-loop workers instead of a fixed rate")
+    parser.add_argument("--poisson", action="store_true", help="exponential instead of uniform arrivals")
+    parser.add_argument("-t", "--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=64, help="max requests in flight (open loop)")
+    parser.add_argument("--retries", type=int, default=0, help="client retries; 0 surfaces every error")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    exchange = MockExchange().start() if args.mock else None
+    base_url = exchange.base_url if exchange else args.base_url
+    workers = args.concurrency or args.workers
+    client = APIClient(base_url=base_url, pool_size=workers, max_workers=workers, retries=args.retries)
+    targets = [(i, tf) for i in args.instruments for tf in args.timeframes]
+    stats = {target: TargetStats() for target in targets}
+    config = {"base_url": client.base_url, "targets": [f"{i} {tf}" for i, tf in targets],
+              "mode": "closed" if args.concurrency else "open", "rate": None if args.concurrency else args.rate,
+              "concurrency": args.concurrency, "poisson": args.poisson, "duration_s": args.duration}
+
+    label = f"{args.concurrency} workers" if args.concurrency else f"{args.rate:g} req/s"
+    print(f"🚚 Loading {client.base_url} with {label} for {args.duration:.0f}s over {len(targets)} targets")
+    started = time.perf_counter()
+    try:
+        if args.concurrency:
+            run_closed_loop(client, targets, stats, args.concurrency, args.duration)
+        else:
+            run_open_loop(client, targets, stats, args.rate, args.duration, args.poisson)
+    finally:
+        client.close()
+        if exchange:
+            exchange.stop()
+    report = export(args.output, config, stats, time.perf_counter() - started)
+
+    for name, summary in report["targets"].items():
+        latency = summary["latency_ms"]
+        print(f"{name:<16} n={summary['requests']:<6} err={summary['error_rate']:<7} "
+              f"p50={latency['p50']}ms p99={latency['p99']}ms p99.9={latency['p99.9']}ms")
+    print(f"✅ {report['throughput_rps']} req/s, results in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from behave.parser import parse_file
+
+DEFAULT_FEATURES = ["features/rest_api.feature", "features/websocket.feature"]
+DURATIONS_FILE = "reports/scenario_durations.json"
+
+
+def discover(feature_paths):
+    # One entry per runnable scenario (outline rows expanded): (location, name)
+    scenarios = []
+    for path in feature_paths:
+        feature = parse_file(path)
+        if feature is None:
+            continue
+        for scenario in feature.walk_scenarios():
+            if "skip" in scenario.effective_tags:
+                continue
+            scenarios.append((f"{scenario.location.filename}:{scenario.location.line}", scenario.name))
+    return scenarios
+
+
+def load_durations(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def plan_shards(scenarios, workers, durations):
+    """Longest-processing-time-first packing of scenarios into worker shards."""
+    known = [durations[name] for _, name in scenarios if name in durations]
+    default = sum(known) / len(known) if known else 1.0
+    ordered = sorted(scenarios, key=lambda s: durations.get(s[1], default), reverse=True)
+    shards = [[] for _ in range(workers)]
+    loads = [0.0] * workers
+    for location, name in ordered:
+        i = loads.index(min(loads))
+        shards[i].append(location)
+        loads[i] += durations.get(name, default)
+    return [(shard, load) for shard, load in zip(shards, loads) if shard]
+
+
+def run_shards(shards, work_dir, extra_args):
+    # Each shard is its own behave process, so every worker gets a fresh context
+    procs = []
+    for i, (locations, _) in enumerate(shards):
+        results_dir = os.path.join(work_dir, f"worker-{i}")
+        os.makedirs(results_dir, exist_ok=True)
+        log = open(os.path.join(work_dir, f"worker-{i}.log"), "w")
+        cmd = [
+            sys.executable, "-m", "behave",
+            "-f", "allure_behave.formatter:AllureFormatter", "-o", results_dir,
+            "-f", "progress",
+            *extra_args, *locations
+        ]
+        env = dict(os.environ, BEHAVE_WORKER=str(i))
+        procs.append((i, subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env), log))
+    codes = []
+    for i, proc, log in procs:
+        codes.append(proc.wait())
+        log.close()
+        print(f"[worker-{i}] exit {codes[-1]} ({len(shards[i][0])} scenarios)")
+    return codes
+
+
+def merge_results(work_dir, output_dir):
+    """Move every worker's Allure files into one result set.
+
+    Workers see the whole feature file, so each also reports the scenarios
+    it did not run as skipped; those copies are dropped when another worker
+    ran the scenario (or an identical skipped copy was already kept). All
+    other files are uuid-named, so a flat move cannot collide.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    worker_dirs = sorted(d for d in glob.glob(os.path.join(work_dir, "worker-*")) if os.path.isdir(d))
+    results = {}
+    for worker_dir in worker_dirs:
+        for path in glob.glob(os.path.join(worker_dir, "*-result.json")):
+            with open(path) as f:
+                results[path] = json.load(f)
+    executed = {r["historyId"] for r in results.values() if r.get("status") != "skipped"}
+    kept_skipped = set()
+    for worker_dir in worker_dirs:
+        for name in os.listdir(worker_dir):
+            path = os.path.join(worker_dir, name)
+            result = results.get(path)
+            if result is not None and result.get("status") == "skipped":
+                if result["historyId"] in executed or result["historyId"] in kept_skipped:
+                    os.remove(path)
+                    continue
+                kept_skipped.add(result["historyId"])
+            shutil.move(path, os.path.join(output_dir, name))
+
+
+def record_durations(work_dir, path, durations):
+    # Only scenarios a worker actually ran; its skipped copies elsewhere take ~0s
+    for result_path in glob.glob(os.path.join(work_dir, "worker-*", "*-result.json")):
+        with open(result_path) as f:
+            result = json.load(f)
+        if result.get("status") != "skipped" and "start" in result and "stop" in result:
+            durations[result["name"]] = (result["stop"] - result["start"]) / 1000
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run behave scenarios in parallel worker processes")
+    parser.add_argument("features", nargs="*", default=DEFAULT_FEATURES)
+    parser.add_argument("-w", "--workers", type=int, default=int(os.getenv("BEHAVE_WORKERS", "4")))
+    parser.add_argument("-o", "--output", default="reports/allure-results")
+    parser.add_argument("--work-dir", default="reports/parallel")
+    parser.add_argument("--durations", default=DURATIONS_FILE)
+    parser.add_argument("--clean", action="store_true", help="empty the output directory first")
+    args, extra_args = parser.parse_known_args()
+
+    scenarios = discover(args.features)
+    durations = load_durations(args.durations)
+    shards = plan_shards(scenarios, max(1, args.workers), durations)
+
+    shutil.rmtree(args.work_dir, ignore_errors=True)
+    if args.clean:
+        shutil.rmtree(args.output, ignore_errors=True)
+
+    print(f"🧵 Running {len(scenarios)} scenarios on {len(shards)} workers")
+    for i, (locations, load) in enumerate(shards):
+        print(f"[worker-{i}] {len(locations)} scenarios, ~{load:.1f}s expected")
+    started = time.time()
+    codes = run_shards(shards, args.work_dir, extra_args)
+    record_durations(args.work_dir, args.durations, durations)
+    merge_results(args.work_dir, args.output)
+    print(f"✅ Finished in {time.time() - started:.1f}s, results in {args.output}")
+    return 1 if any(codes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tests.utils.mock_exchange import MockExchange
+from tests.utils.ws_client import WebSocketClient
+
+DEFAULT_OUTPUT = "reports/ws_benchmark.json"
+DEFAULT_BASELINE = "benchmarks/ws_baseline.json"
+
+# Metrics compared against the baseline: True when higher is better. Only
+# GATED ones fail the run; the rest depend on the host and are reported.
+GATED = {
+    "messages_per_s": True,
+    "bytes_per_s": True,
+}
+REPORTED = {
+    "decode_us_per_frame": False,
+    "latency_ms.p99": False,
+    "interarrival_ms.p99": False,
+}
+# Counts that must stay at zero whatever the baseline says
+MUST_BE_ZERO = ("dropped", "sequence_gaps", "errors")
+
+
+def percentiles(values):
+    if not len(values):
+        return {"p50": None, "p99": None, "p999": None, "max": None}
+    p50, p99, p999 = np.percentile(values, [50, 99, 99.9])
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3),
+            "p999": round(float(p999), 3), "max": round(float(np.max(values)), 3)}
+
+
+async def consume(client, channels, latencies, gaps, counts):
+    last_arrival = {}
+    async for frame in client:
+        arrival = time.perf_counter()
+        if frame.get("code", 0) != 0:
+            counts["errors"] += 1
+            continue
+        result = frame.get("result") or {}
+        channel = result.get("subscription")
+        data = result.get("data")
+        if channel not in channels or not data:
+            continue
+        counts[channel] += 1
+        # Exchange-to-local latency; only meaningful with synchronised clocks
+        t = data[0].get("t")
+        if t is not None:
+            latencies.append(time.time() * 1000 - t)
+        previous = last_arrival.get(channel)
+        if previous is not None:
+            gaps.append((arrival - previous) * 1000)
+        last_arrival[channel] = arrival
+
+
+async def run(ws_url, channels, duration, max_queue):
+    latencies, gaps = [], []
+    counts = dict.fromkeys(channels, 0)
+    counts["errors"] = 0
+    client = WebSocketClient(ws_url, max_queue=max_queue)
+    await client.subscribe(*channels)
+    consumer = asyncio.create_task(consume(client, set(channels), latencies, gaps, counts))
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    frames, size, decode_ns = client.frames_received, client.bytes_received, client.decode_ns
+    dropped = client.frames_dropped
+    await client.close()
+    await consumer
+    errors = counts.pop("errors")
+    return {
+        "duration_s": round(elapsed, 3),
+        "messages": frames,
+        "messages_per_s": round(frames / elapsed, 2),
+        "dropped": dropped,
+        "sequence_gaps": len(client.sequences.missed),
+        "errors": errors,
+        "bytes_per_s": round(size / elapsed, 2),
+        "decode_us_per_frame": round(decode_ns / frames / 1000, 3) if frames else None,
+        "latency_ms": percentiles(np.array(latencies)),
+        "interarrival_ms": percentiles(np.array(gaps)),
+        "channels": counts,
+    }
+
+
+def metric(results, name):
+    value = results
+    for part in name.split("."):
+        value = (value or {}).get(part)
+    return value
+
+
+def compare(results, baseline, tolerance, metrics=GATED):
+    """Names of ``metrics`` that are more than ``tolerance`` worse than baseline."""
+    regressions = []
+    for name, higher_is_better in metrics.items():
+        current, reference = metric(results, name), metric(baseline, name)
+        if current is None or not reference:
+            continue
+        change = (current - reference) / reference
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{name}: {current} vs baseline {reference} ({change:+.1%})")
+    return regressions
+
+
+def nonzero(results):
+    return [f"{name}: {results[name]}" for name in MUST_BE_ZERO if results.get(name)]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Measure book channel throughput and latency")
+    parser.add_argument("--url", default=os.getenv("WS_URL"))
+    parser.add_argument("--mock", action="store_true", help="benchmark against the in-process mock exchange")
+    parser.add_argument("--mock-rate", type=float, default=100.0, help="mock frames/s per subscription")
+    parser.add_argument("-i", "--instruments", nargs="+", default=["BTC_USDT", "ETH_USDT"])
+    parser.add_argument("-d", "--depths", nargs="+", type=int, default=[10, 50])
+    parser.add_argument("-t", "--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--max-queue", type=int, default=1000)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    exchange = MockExchange(rate=args.mock_rate).start() if args.mock else None
+    ws_url = exchange.ws_url if exchange else args.url
+    if not ws_url:
+        parser.error("no WebSocket URL: pass --url, set WS_URL or use --mock")
+    channels = [f"book.{i}.{d}" for i in args.instruments for d in args.depths]
+
+    print(f"⏱️ Benchmarking {len(channels)} channels on {ws_url} for {args.duration:.0f}s")
+    try:
+        results = asyncio.run(run(ws_url, channels, args.duration, args.max_queue))
+    finally:
+        if exchange:
+            exchange.stop()
+    results["config"] = {"url": ws_url, "mock": args.mock, "channels": channels,
+                         "mock_rate": args.mock_rate if args.mock else None}
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({k: v for k, v in results.items() if k not in ("channels", "config")}, indent=2))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+    regressions = nonzero(results)
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions += compare(results, baseline, args.tolerance)
+        for change in compare(results, baseline, args.tolerance, REPORTED):
+            print(f"⚠️ Host-dependent change (not gated) {change}")
+    else:
+        print(f"No baseline at {args.baseline}; checking counts only")
+    for regression in regressions:
+        print(f"❌ Regression {regression}")
+    if not regressions:
+        print("✅ Within baseline tolerance")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
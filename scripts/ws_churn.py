@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import websockets
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from tests.utils.histogram import Histogram
+from tests.utils.json_codec import loads
+from tests.utils.mock_exchange import MockExchange
+
+DEFAULT_OUTPUT = "reports/ws_churn.json"
+
+
+class ChurnStats:
+    """Outcome of one churn stage: request/ack accounting, leaks and latencies (µs)."""
+
+    def __init__(self):
+        self.ack_us = Histogram()
+        self.first_frame_us = Histogram()
+        self.requests = 0
+        self.acked = 0
+        self.switches = 0
+        self.frames = 0
+        self.in_flight_frames = 0
+        self.unmatched_acks = 0
+        self.unacked = 0
+        self.switched_before_data = 0
+        self.errors = Counter()
+        self.leaked = Counter()
+
+    def summary(self, rate, elapsed):
+        return {
+            "target_rate": rate,
+            "achieved_rate": round(self.switches / elapsed, 2) if elapsed else None,
+            "switches": self.switches,
+            "requests": self.requests,
+            "acked": self.acked,
+            "unacked": self.unacked,
+            "unmatched_acks": self.unmatched_acks,
+            "errors": {str(code): n for code, n in self.errors.items()},
+            "frames": self.frames,
+            "in_flight_frames": self.in_flight_frames,
+            "switched_before_data": self.switched_before_data,
+            "leaked_frames": sum(self.leaked.values()),
+            "leaked_channels": dict(self.leaked),
+            "ack_ms": self.ack_us.summary(scale=1000),
+            "first_frame_ms": self.first_frame_us.summary(scale=1000),
+        }
+
+
+class ChurnDriver:
+    """Rotates book subscriptions on one socket and accounts for every request.
+
+    Each request carries a unique id and its ack is matched back to it. A
+    channel is ``subscribing`` until acked, then ``active``; ``unsubscribing``
+    until its unsubscribe is acked, then ``idle``. Data frames for an idle
+    channel are leaks; frames between an unsubscribe and its ack are only
+    counted as in flight. The first data frame after each subscribe gives the
+    switch-to-data latency.
+    """
+
+    def __init__(self, ws, channels, slots, rnd=None):
+        self.ws = ws
+        self.channels = channels
+        self.slots = [None] * slots
+        self.rnd = rnd or random.Random()
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.state = {}
+        self.first_frame_due = {}
+        self.stats = ChurnStats()
+        self.closed = None
+
+    async def request(self, method, channels):
+        request_id = next(self.ids)
+        sent = time.perf_counter_ns()
+        self.pending[request_id] = (method, channels, sent)
+        for channel in channels:
+            self.state[channel] = "subscribing" if method == "subscribe" else "unsubscribing"
+            if method == "subscribe":
+                self.first_frame_due[channel] = sent
+            elif self.first_frame_due.pop(channel, None) is not None:
+                self.stats.switched_before_data += 1
+        self.stats.requests += 1
+        await self.ws.send(json.dumps({"id": request_id, "method": method, "params": {"channels": channels}}))
+
+    async def switch(self):
+        """Replace one slot's channel with an idle one: unsubscribe, then subscribe."""
+        idle = [c for c in self.channels if self.state.get(c, "idle") == "idle"]
+        if not idle:
+            return False
+        slot = self.rnd.randrange(len(self.slots))
+        new = self.rnd.choice(idle)
+        if self.slots[slot] is not None:
+            await self.request("unsubscribe", [self.slots[slot]])
+        await self.request("subscribe", [new])
+        self.slots[slot] = new
+        self.stats.switches += 1
+        return True
+
+    async def read(self):
+        try:
+            async for message in self.ws:
+                now = time.perf_counter_ns()
+                frame = loads(message)
+                if frame.get("method") == "public/heartbeat":
+                    await self.ws.send(json.dumps({"id": frame.get("id"), "method": "public/respond-heartbeat"}))
+                    continue
+                result = frame.get("result") or {}
+                if result.get("data") is not None and result.get("subscription"):
+                    self.on_data(result["subscription"], now)
+                else:
+                    self.on_ack(frame, now)
+        except websockets.ConnectionClosed as e:
+            self.closed = f"connection closed: {e}"
+        else:
+            self.closed = "connection closed"
+
+    def on_ack(self, frame, now):
+        pending = self.pending.pop(frame.get("id"), None)
+        if pending is None:
+            self.stats.unmatched_acks += 1
+            return
+        method, channels, sent = pending
+        self.stats.acked += 1
+        self.stats.ack_us.record((now - sent) // 1000)
+        code = frame.get("code", 0)
+        if code != 0:
+            self.stats.errors[code] += 1
+        for channel in channels:
+            # A later request for the channel owns its state now
+            if self.state.get(channel) == ("subscribing" if method == "subscribe" else "unsubscribing"):
+                self.state[channel] = "active" if method == "subscribe" and code == 0 else "idle"
+
+    def on_data(self, channel, now):
+        self.stats.frames += 1
+        state = self.state.get(channel, "idle")
+        if state == "idle":
+            self.stats.leaked[channel] += 1
+        elif state == "unsubscribing":
+            self.stats.in_flight_frames += 1
+        else:
+            due = self.first_frame_due.pop(channel, None)
+            if due is not None:
+                self.stats.first_frame_us.record((now - due) // 1000)
+
+    async def settle(self, timeout):
+        deadline = time.monotonic() + timeout
+        while self.pending and not self.closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self.stats.unacked = len(self.pending)
+        self.pending.clear()
+
+
+def faults(summary):
+    # Protocol faults: independent of how fast the host is, so they fail the run
+    reasons = []
+    if summary["unacked"] or summary["unmatched_acks"]:
+        reasons.append(f"{summary['unacked']} unacked, {summary['unmatched_acks']} unmatched acks")
+    if summary["errors"]:
+        reasons.append(f"error codes {summary['errors']}")
+    if summary["leaked_frames"]:
+        reasons.append(f"{summary['leaked_frames']} frames leaked from unsubscribed channels")
+    return reasons
+
+
+def degraded(summary, max_ack_ms):
+    reasons = faults(summary)
+    if summary["ack_ms"]["p99"] is not None and summary["ack_ms"]["p99"] > max_ack_ms:
+        reasons.append(f"ack p99 {summary['ack_ms']['p99']}ms > {max_ack_ms}ms")
+    if summary["achieved_rate"] is not None and summary["achieved_rate"] < 0.9 * summary["target_rate"]:
+        reasons.append(f"only {summary['achieved_rate']} switches/s")
+    return reasons
+
+
+async def run(ws_url, channels, slots, rates, duration, settle, max_ack_ms, seed):
+    stages = []
+    async with websockets.connect(ws_url) as ws:
+        driver = ChurnDriver(ws, channels, slots, random.Random(seed))
+        reader = asyncio.create_task(driver.read())
+        # Ramp up on the same socket so degradation carries over between stages
+        for rate in rates:
+            driver.stats = ChurnStats()
+            interval = 1.0 / rate
+            started = due = time.perf_counter()
+            while not driver.closed and time.perf_counter() - started < duration:
+                await driver.switch()
+                due += interval
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            elapsed = time.perf_counter() - started
+            await driver.settle(settle)
+            summary = driver.stats.summary(rate, elapsed)
+            summary["faults"] = faults(summary) + ([driver.closed] if driver.closed else [])
+            summary["degraded"] = degraded(summary, max_ack_ms) + ([driver.closed] if driver.closed else [])
+            stages.append(summary)
+            status = "❌ " + "; ".join(summary["degraded"]) if summary["degraded"] else "✅"
+            print(f"{rate:>8g}/s achieved={summary['achieved_rate']:<8} ack p99={summary['ack_ms']['p99']}ms "
+                  f"first frame p99={summary['first_frame_ms']['p99']}ms "
+                  f"(n={summary['first_frame_ms']['count']}) leaked={summary['leaked_frames']} {status}")
+            if driver.closed:
+                break
+        reader.cancel()
+    return stages
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Rotate book subscriptions at rising rates on one WebSocket")
+    parser.add_argument("--url", default=os.getenv("WS_URL"))
+    parser.add_argument("--mock", action="store_true", help="churn against the in-process mock exchange")
+    parser.add_argument("--mock-rate", type=float, default=20.0, help="mock frames/s per subscription")
+    parser.add_argument("-i", "--instruments", nargs="+", default=["BTC_USDT", "ETH_USDT", "CRO_USDT"])
+    parser.add_argument("-d", "--depths", nargs="+", type=int, default=[10, 50, 150])
+    parser.add_argument("-s", "--slots", type=int, default=2, help="channels subscribed at any time")
+    parser.add_argument("-r", "--rates", nargs="+", type=float, default=[1, 5, 20, 50], help="switches/s per stage")
+    parser.add_argument("-t", "--duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait for outstanding acks")
+    parser.add_argument("--max-ack-ms", type=float, default=1000.0, help="ack p99 above this counts as degraded")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    channels = [f"book.{i}.{d}" for i in args.instruments for d in args.depths]
+    if len(channels) <= args.slots:
+        parser.error("need more channels than slots to rotate through")
+    exchange = MockExchange(rate=args.mock_rate).start() if args.mock else None
+    ws_url = exchange.ws_url if exchange else args.url
+    if not ws_url:
+        parser.error("no WebSocket URL: pass --url, set WS_URL or use --mock")
+
+    print(f"🔀 Churning {args.slots} of {len(channels)} channels on {ws_url}, {args.duration:.0f}s per rate")
+    try:
+        stages = asyncio.run(run(ws_url, channels, args.slots, sorted(args.rates), args.duration,
+                                 args.settle, args.max_ack_ms, args.seed))
+    finally:
+        if exchange:
+            exchange.stop()
+    sustained = [s["target_rate"] for s in itertools.takewhile(lambda s: not s["degraded"], stages)]
+    report = {
+        "config": {"url": ws_url, "mock": args.mock, "channels": channels, "slots": args.slots,
+                   "duration_s": args.duration, "max_ack_ms": args.max_ack_ms},
+        "max_sustained_rate": sustained[-1] if sustained else None,
+        "stages": stages,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Max sustained switch rate: {report['max_sustained_rate']}/s, results in {args.output}")
+    # The sustained rate depends on the host; only protocol faults fail the run
+    return 1 if any(stage["faults"] for stage in stages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
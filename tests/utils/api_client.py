@@ -1,15 +1,281 @@
-import requests
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tests.utils.json_codec import loads
+from tests.utils.metrics import REST_REQUEST_SECONDS, REST_RESPONSE_BYTES
+from tests.utils.recorder import REST_REQUEST, REST_RESPONSE, request_key
+
+DEFAULT_BASE_URL = "https://api.crypto.com/v2"
+
+# Candle width in milliseconds for each exchange timeframe
+TIMEFRAME_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "2h": 7_200_000,
+    "4h": 14_400_000,
+    "12h": 43_200_000,
+    "1D": 86_400_000,
+    "7D": 604_800_000,
+    "14D": 1_209_600_000,
+    "1M": 2_592_000_000,
+}
+
+
+def timeframe_ms(timeframe):
+    # Accept "1d"-style lower-case day aliases alongside the exchange spelling
+    if timeframe in TIMEFRAME_MS:
+        return TIMEFRAME_MS[timeframe]
+    if timeframe.endswith("d") and timeframe[:-1] + "D" in TIMEFRAME_MS:
+        return TIMEFRAME_MS[timeframe[:-1] + "D"]
+    raise ValueError(f"Unknown timeframe: {timeframe}")
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads; acquire() blocks until allowed."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 
 class APIClient:
-    def __init__(self, base_url=None):
-        self.base_url = base_url or os.getenv("BASE_URL")
-
-    def get_candlestick(self, instrument_name, timeframe):
-        endpoint = f"{self.base_url}/public/get-candlestick"
-        params = {
-            "instrument_name": instrument_name,
-            "timeframe": timeframe
-        }
-        response = requests.get(endpoint, params=params)
+    """REST client over one pooled keep-alive session.
+
+    Connections are reused across calls, idempotent GETs are retried with
+    backoff on throttling/5xx, and bulk fetches fan out over a bounded pool.
+    With a ``cache`` (a CandleCache) history pulls only fetch what is missing.
+    A ``recorder`` (TrafficRecorder) logs every request and response; a
+    ``replay`` (TrafficReplay) answers from a recording instead of the network.
+    """
+
+    def __init__(self, base_url=None, pool_size=16, max_workers=8, retries=3,
+                 backoff_factor=0.3, timeout=(3.05, 10), rate_limit=50, cache=None,
+                 recorder=None, replay=None):
+        self.base_url = base_url or os.getenv("BASE_URL") or DEFAULT_BASE_URL
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.recorder = recorder
+        self.executor = None
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if replay is not None:
+            adapter = replay.rest_adapter()
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    def get(self, method, params=None):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.send_get(method, params)
+            status = str(response.status_code)
+            REST_RESPONSE_BYTES.labels(method).observe(len(response.content))
+            return response
+        finally:
+            REST_REQUEST_SECONDS.labels(method, status).observe(time.perf_counter() - started)
+
+    def send_get(self, method, params):
+        if self.recorder is None:
+            return self.session.get(f"{self.base_url}/{method}", params=params, timeout=self.timeout)
+        request = self.session.prepare_request(requests.Request("GET", f"{self.base_url}/{method}", params=params))
+        key = request_key("GET", request.url)
+        self.recorder.record(REST_REQUEST, {"key": key, "url": request.url})
+        settings = self.session.merge_environment_settings(request.url, {}, None, None, None)
+        response = self.session.send(request, timeout=self.timeout, **settings)
+        self.recorder.record(REST_RESPONSE, {
+            "key": key,
+            "status": response.status_code,
+            "elapsed": response.elapsed.total_seconds(),
+            "headers": {"Content-Type": response.headers.get("Content-Type", "")}
+        }, response.content)
         return response
+
+    def get_candlestick(self, instrument_name=None, timeframe=None, **params):
+        # Omitted arguments are left out of the query (negative tests rely on it)
+        query = {"instrument_name": instrument_name, "timeframe": timeframe, **params}
+        return self.get("public/get-candlestick", {k: v for k, v in query.items() if v is not None})
+
+    def get_candlesticks_bulk(self, queries):
+        """Fetch many candlestick queries concurrently; responses keep input order.
+
+        Each query is a dict of ``get_candlestick`` keyword arguments or an
+        ``(instrument_name, timeframe)`` tuple.
+        """
+        executor = self.pool()
+        futures = [
+            executor.submit(self.get_candlestick, **q) if isinstance(q, dict)
+            else executor.submit(self.get_candlestick, *q)
+            for q in queries
+        ]
+        return [f.result() for f in futures]
+
+    def iter_candlesticks(self, instrument_name, timeframe, start, end, page_size=300, rate_limit=None,
+                          now_ms=None):
+        """Stream candles for an arbitrary [start, end] range (ms), oldest first.
+
+        Served through the candle cache when one is configured, otherwise
+        straight from ``fetch_candlesticks``. ``now_ms`` is the time the cache
+        treats as current (default: the wall clock).
+        """
+        def fetch(fetch_start, fetch_end):
+            return self.fetch_candlesticks(instrument_name, timeframe, fetch_start, fetch_end, page_size, rate_limit)
+
+        if self.cache is None:
+            return fetch(start, end)
+        return self.cache.iter_range(fetch, instrument_name, timeframe, start, end, now_ms)
+
+    def fetch_candlesticks(self, instrument_name, timeframe, start, end, page_size=300, rate_limit=None):
+        """Stream candles for [start, end] (ms) from the server, oldest first.
+
+        The range is cut into windows of ``page_size`` candles which are
+        fetched concurrently under a requests-per-second budget. Windows are
+        merged in order and candles repeated across window edges are dropped
+        by ``t``.
+        """
+        step = timeframe_ms(timeframe)
+        span = page_size * step
+        limiter = RateLimiter(rate_limit or self.rate_limit)
+
+        def fetch(window_start, window_end):
+            limiter.acquire()
+            response = self.get_candlestick(
+                instrument_name, timeframe, start=window_start, end=window_end, count=page_size
+            )
+            response.raise_for_status()
+            body = loads(response.content)
+            if body.get("code") != 0:
+                raise RuntimeError(
+                    f"get-candlestick failed for {instrument_name} {timeframe} "
+                    f"[{window_start}, {window_end}]: code {body.get('code')}"
+                )
+            return sorted(body.get("result", {}).get("data", []), key=lambda d: int(d["t"]))
+
+        executor = self.pool()
+        pending = deque()
+        last_t = None
+        window_start = start
+        try:
+            while window_start <= end or pending:
+                # Keep a bounded number of windows in flight ahead of the consumer
+                while window_start <= end and len(pending) < self.max_workers * 2:
+                    window_end = min(window_start + span - 1, end)
+                    pending.append(executor.submit(fetch, window_start, window_end))
+                    window_start = window_end + 1
+                for candle in pending.popleft().result():
+                    t = int(candle["t"])
+                    if start <= t <= end and (last_t is None or t > last_t):
+                        last_t = t
+                        yield candle
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def pool(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="api-client")
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.session.close()
+
+
+class RequestCoalescer:
+    """Shares get-candlestick responses between identical requests in a run.
+
+    Requests with the same parameters map to one future: a request already
+    in flight is joined rather than sent again, and finished responses are
+    reused, keeping the ``max_entries`` most recent; failed requests are
+    dropped once done so a later identical one is sent again. Unique
+    requests run concurrently on the client's pool. Responses are shared, so
+    callers must treat them as read-only.
+    """
+
+    def __init__(self, client, max_entries=1024):
+        self.client = client
+        self.max_entries = max_entries
+        self.futures = OrderedDict()
+        self.lock = threading.Lock()
+        self.requested = 0
+        self.fetched = 0
+
+    @staticmethod
+    def key(params):
+        return tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+    def submit(self, params):
+        key = self.key(params)
+        with self.lock:
+            self.requested += 1
+            future = self.futures.get(key)
+            fresh = future is None
+            if fresh:
+                future = self.client.pool().submit(self.client.get_candlestick, **params)
+                self.futures[key] = future
+                self.fetched += 1
+                if len(self.futures) > self.max_entries:
+                    self.futures.popitem(last=False)
+            else:
+                self.futures.move_to_end(key)
+        if fresh:
+            # Outside the lock: the callback runs right here if already done
+            future.add_done_callback(lambda f: self.forget_failed(key, f))
+        return future
+
+    def forget_failed(self, key, future):
+        # Exceptions and 5xx responses are not shared: the next identical request retries
+        failed = future.exception() is not None or future.result().status_code >= 500
+        if failed:
+            with self.lock:
+                if self.futures.get(key) is future:
+                    del self.futures[key]
+
+    def get_candlestick(self, **params):
+        return self.submit(params).result()
+
+    def get_many(self, queries):
+        """Responses for a list of parameter dicts, in order; each unique one fetched once."""
+        futures = [self.submit(q) for q in queries]
+        return [f.result() for f in futures]
+
+    def stats(self):
+        return {"requested": self.requested, "fetched": self.fetched}
@@ -0,0 +1,104 @@
+import gzip
+import os
+import shutil
+import tempfile
+from collections import deque
+
+import allure
+
+# === Size caps (bytes of uncompressed content per attachment) ===
+ATTACH_MAX_BYTES = int(os.getenv("ATTACH_MAX_BYTES", 1024 * 1024))
+ATTACH_COMPRESS_OVER = int(os.getenv("ATTACH_COMPRESS_OVER", 256 * 1024))
+ATTACH_CHUNK = 64 * 1024
+# Inline preview of a response body on passing steps
+ATTACH_PREVIEW_BYTES = int(os.getenv("ATTACH_PREVIEW_BYTES", 1000))
+
+
+class AttachmentWriter:
+    """Builds one Allure attachment in a temp file, a piece at a time.
+
+    At most ``max_bytes`` are kept: the first half as written, the second
+    half as a rolling tail of the latest pieces, with an omission marker for
+    whatever fell in between. Memory use is bounded by the tail budget. Files
+    over ``compress_over`` bytes are gzipped before they are attached.
+    """
+
+    def __init__(self, name, attachment_type=allure.attachment_type.TEXT, max_bytes=None, compress_over=None):
+        self.name = name
+        self.attachment_type = attachment_type
+        self.max_bytes = ATTACH_MAX_BYTES if max_bytes is None else max_bytes
+        self.compress_over = ATTACH_COMPRESS_OVER if compress_over is None else compress_over
+        self.head_budget = self.max_bytes // 2
+        self.tail_budget = self.max_bytes - self.head_budget
+        self.file = tempfile.NamedTemporaryFile("wb", prefix="allure-", delete=False)
+        self.written = 0
+        self.in_tail = False
+        self.tail = deque()
+        self.tail_bytes = 0
+        self.omitted = 0
+        self.omitted_bytes = 0
+
+    def write(self, piece):
+        data = piece.encode() if isinstance(piece, str) else piece
+        if not self.in_tail and self.written + len(data) <= self.head_budget:
+            self.file.write(data)
+            self.written += len(data)
+            return
+        self.in_tail = True
+        self.tail.append(data)
+        self.tail_bytes += len(data)
+        while self.tail_bytes > self.tail_budget and self.tail:
+            dropped = self.tail.popleft()
+            self.tail_bytes -= len(dropped)
+            self.omitted += 1
+            self.omitted_bytes += len(dropped)
+
+    def write_body(self, body):
+        """Write one large payload in chunks so head and tail both survive the cap."""
+        view = memoryview(body.encode() if isinstance(body, str) else body)
+        for i in range(0, len(view), ATTACH_CHUNK):
+            self.write(bytes(view[i:i + ATTACH_CHUNK]))
+
+    def write_lines(self, lines):
+        for line in lines:
+            self.write((line.encode() if isinstance(line, str) else line) + b"\n")
+
+    def attach(self):
+        if self.omitted:
+            self.file.write(f"\n... {self.omitted} pieces ({self.omitted_bytes} bytes) omitted ...\n".encode())
+        for data in self.tail:
+            self.file.write(data)
+        self.tail.clear()
+        self.file.close()
+        path = self.file.name
+        try:
+            if os.path.getsize(path) > self.compress_over:
+                compressed = path + ".gz"
+                with open(path, "rb") as src, gzip.open(compressed, "wb") as dst:
+                    shutil.copyfileobj(src, dst, ATTACH_CHUNK)
+                os.remove(path)
+                path = compressed
+                allure.attach.file(path, name=f"{self.name} (gzip)", attachment_type="application/gzip",
+                                   extension=f"{self.attachment_type.extension}.gz")
+            else:
+                allure.attach.file(path, name=self.name, attachment_type=self.attachment_type)
+        finally:
+            os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.attach()
+
+
+def attach_text(body, name, max_bytes=None):
+    """Attach a possibly large string or bytes payload under the size cap."""
+    with AttachmentWriter(name, max_bytes=max_bytes) as writer:
+        writer.write_body(body)
+
+
+def attach_frames(frames, name, max_bytes=None):
+    """Attach raw frames as JSON lines, streamed from any iterable."""
+    with AttachmentWriter(name, max_bytes=max_bytes) as writer:
+        writer.write_lines(frames)
@@ -0,0 +1,273 @@
+import os
+import queue
+import re
+import threading
+import time
+from itertools import accumulate
+
+import numpy as np
+
+from tests.utils.logger import get_logger
+from tests.utils.order_book import OrderBook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = get_logger(__name__)
+
+# Cumulative depth is captured over the best N levels for each N here
+CAPTURE_LEVELS = (5, 10)
+
+
+def capture_columns(levels):
+    columns = [("t", np.int64), ("recv_ns", np.int64), ("bid", np.float64), ("ask", np.float64),
+               ("spread", np.float64), ("size", np.int32)]
+    for n in levels:
+        columns += [(f"bid_depth_{n}", np.float32), (f"ask_depth_{n}", np.float32)]
+    return columns
+
+
+def percentiles(values, qs=(50, 90, 99)):
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": round(float(v), 6) for q, v in zip(qs, np.percentile(values, qs))}
+
+
+class BookSeries:
+    """Top-of-book metrics of one channel in preallocated NumPy columns.
+
+    Rows go into a ring of ``capacity`` rows; every ``chunk`` new rows are
+    handed to the sink, so memory stays fixed however long the session runs
+    while the ring still covers the rolling-statistics window.
+    """
+
+    def __init__(self, channel, sink, levels=CAPTURE_LEVELS, capacity=16384, chunk=4096):
+        if chunk > capacity:
+            raise ValueError("chunk must not exceed capacity")
+        self.channel = channel
+        self.sink = sink
+        self.levels = tuple(levels)
+        self.deepest = max(self.levels)
+        self.capacity = capacity
+        self.chunk = chunk
+        # One structured row per frame; ``columns`` are views into it
+        self.data = np.zeros(capacity, np.dtype(capture_columns(self.levels)))
+        self.columns = {name: self.data[name] for name in self.data.dtype.names}
+        self.end = 0
+        self.flushed = 0
+        self.book = None
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def append(self, t, recv_ns, bid, ask, bid_qty, ask_qty, size):
+        """Add one frame: best prices and level quantities per side, best first."""
+        row = [t or 0, recv_ns, bid, ask, ask - bid, size]
+        bid_depth = list(accumulate(bid_qty[:self.deepest])) or [0.0]
+        ask_depth = list(accumulate(ask_qty[:self.deepest])) or [0.0]
+        for n in self.levels:
+            row += (bid_depth[min(n, len(bid_depth)) - 1], ask_depth[min(n, len(ask_depth)) - 1])
+        with self.lock:
+            self.data[self.end % self.capacity] = tuple(row)
+            self.end += 1
+        if self.end - self.flushed >= self.chunk:
+            self.flush()
+
+    def rows(self, start, stop):
+        # Columns for absolute rows [start, stop); copies, safe to use unlocked
+        start = max(start, self.end - self.capacity)
+        a, b = start % self.capacity, stop % self.capacity
+        if stop - start <= 0:
+            return {name: col[:0].copy() for name, col in self.columns.items()}
+        if a < b:
+            return {name: col[a:b].copy() for name, col in self.columns.items()}
+        return {name: np.concatenate([col[a:], col[:b]]) for name, col in self.columns.items()}
+
+    def flush(self):
+        with self.lock:
+            start, stop = self.flushed, self.end
+            chunk = self.rows(start, stop) if self.sink is not None and stop > start else None
+            self.flushed = stop
+        if chunk is not None:
+            self.sink.write(self.channel, chunk)
+
+    def stats(self, window_s=60.0, now_ns=None):
+        """Update rate, spread percentiles, staleness and cadence over the last ``window_s``
+        (``None``: every row still in the ring)."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        with self.lock:
+            cols = self.rows(0, self.end)
+        recv = cols["recv_ns"]
+        mask = recv >= (now_ns - int(window_s * 1e9) if window_s is not None else 0)
+        recv = recv[mask]
+        n = len(recv)
+        span_s = (recv[-1] - recv[0]) / 1e9 if n > 1 else 0.0
+        stats = {
+            "frames": n,
+            "update_rate": round((n - 1) / span_s, 3) if span_s else None,
+            "bytes_per_s": round(float(cols["size"][mask].sum()) / span_s, 1) if span_s else None,
+            "staleness_ms": round((now_ns - recv[-1]) / 1e6, 3) if n else None,
+            "spread": percentiles(cols["spread"][mask]),
+            "interarrival_ms": percentiles(np.diff(recv) / 1e6, (50, 99)),
+            "exchange_lag_ms": percentiles(recv / 1e6 - cols["t"][mask], (50, 99)),
+        }
+        for n_levels in self.levels:
+            for side in ("bid", "ask"):
+                depth = cols[f"{side}_depth_{n_levels}"][mask]
+                stats[f"{side}_depth_{n_levels}_mean"] = round(float(depth.mean()), 6) if len(depth) else None
+        return stats
+
+
+class ParquetSink:
+    """Appends each flushed chunk as a row group of ``<channel>.parquet`` (or Arrow IPC batches)."""
+
+    def __init__(self, root, format="parquet"):
+        self.root = root
+        self.format = format
+        self.writers = {}
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, channel, columns):
+        table = pa.table(columns)
+        writer = self.writers.get(channel)
+        if writer is None:
+            path = os.path.join(self.root, f"{file_name(channel)}.{self.format}")
+            if self.format == "parquet":
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(path, table.schema)
+            self.writers[channel] = writer
+        writer.write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+class NpzSink:
+    """Fallback without pyarrow: one compressed ``.npz`` file per flushed chunk."""
+
+    def __init__(self, root):
+        self.root = root
+        self.chunks = {}
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, channel, columns):
+        n = self.chunks.get(channel, 0)
+        self.chunks[channel] = n + 1
+        np.savez_compressed(os.path.join(self.root, f"{file_name(channel)}-{n:05d}.npz"), **columns)
+
+    def close(self):
+        pass
+
+
+class SinkWriter:
+    """Runs a sink's writes on one background thread.
+
+    Flushes happen on the socket thread, so the compression and disk I/O of
+    a chunk must not: ``write`` only queues it. At most ``max_pending``
+    chunks wait; beyond that ``write`` blocks until the writer catches up.
+    """
+
+    def __init__(self, sink, max_pending=32):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.errors = 0
+        self.thread = threading.Thread(target=self.run, name="book-capture-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, channel, columns):
+        self.queue.put((channel, columns))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self.sink.write(*item)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Book capture write for {item[0]} failed: {e!r}")
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+
+def file_name(channel):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", channel)
+
+
+def make_sink(root, format=None):
+    """Parquet by default, ``arrow`` for Arrow IPC; ``npz`` when pyarrow is not installed."""
+    if format is None and pa is None:
+        logger.warning("pyarrow is not installed; book capture falls back to .npz chunks")
+    format = format or ("parquet" if pa is not None else "npz")
+    if format == "npz":
+        return NpzSink(root)
+    if pa is None:
+        raise ValueError(f"Book capture format {format!r} needs pyarrow")
+    return ParquetSink(root, format)
+
+
+class BookCapture:
+    """Captures top-of-book metrics for every book channel of a session.
+
+    ``record`` takes a decoded book ``result``: snapshots are read directly,
+    ``book.update`` deltas go through an OrderBook kept per channel. ``root``
+    (optional) receives the flushed chunks through a SinkWriter thread;
+    without it only the in-memory ring is kept for ``stats``.
+    """
+
+    def __init__(self, root=None, format=None, levels=CAPTURE_LEVELS, capacity=16384, chunk=4096):
+        self.sink = SinkWriter(make_sink(root, format)) if root else None
+        self.options = dict(levels=levels, capacity=capacity, chunk=chunk)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def channel(self, channel):
+        series = self.series.get(channel)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(channel, BookSeries(channel, self.sink, **self.options))
+        return series
+
+    def record(self, channel, result, size, recv_ns=None):
+        recv_ns = time.time_ns() if recv_ns is None else recv_ns
+        series = self.channel(channel)
+        if result.get("channel") == "book.update" or series.book is not None:
+            if series.book is None:
+                # First delta: start from the last snapshot seen
+                series.book = OrderBook(depth=series.deepest)
+                if series.snapshot is not None:
+                    series.book.apply(series.snapshot)
+            book = series.book
+            book.apply(result)
+            scale = 10 ** book.scale
+            bids, asks = book.bids.top(series.deepest), book.asks.top(series.deepest)
+            series.append(book.t, recv_ns, bids[0][0] / scale if bids else np.nan, asks[0][0] / scale if asks else np.nan,
+                          [q / scale for _, q in bids], [q / scale for _, q in asks], size)
+            return
+        # Snapshots only: read the best levels straight from the frame
+        series.snapshot = result
+        deepest = series.deepest
+        for entry in result.get("data", []):
+            bids, asks = entry.get("bids", []), entry.get("asks", [])
+            series.append(entry.get("t"), recv_ns, float(bids[0][0]) if bids else np.nan,
+                          float(asks[0][0]) if asks else np.nan,
+                          [float(level[1]) for level in bids[:deepest]], [float(level[1]) for level in asks[:deepest]], size)
+
+    def stats(self, window_s=60.0):
+        return {channel: series.stats(window_s) for channel, series in list(self.series.items())}
+
+    def close(self):
+        for series in list(self.series.values()):
+            series.flush()
+        if self.sink is not None:
+            self.sink.close()
@@ -0,0 +1,178 @@
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from tests.utils.api_client import timeframe_ms
+from tests.utils.candles import CANDLE_DTYPE
+
+
+class CandleCache:
+    """On-disk cache of closed candles, one memory-mapped .npy per time bucket.
+
+    A bucket holds ``bucket_candles`` consecutive candles of one instrument
+    and timeframe (one server page by default). The manifest records, per
+    bucket, the time up to which it is complete; closed candles never change,
+    so only the part after that mark, i.e. the still-open tail, is fetched
+    again. Least recently used buckets are evicted past ``max_bytes``.
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, bucket_candles=300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.bucket_candles = bucket_candles
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+            # The size budget may have shrunk since the last run
+            self.evict()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "buckets": len(self.manifest),
+            "bytes": sum(e["bytes"] for e in self.manifest.values()),
+        }
+
+    def key(self, instrument_name, timeframe, bucket_start):
+        return f"{instrument_name}/{timeframe}/{bucket_start}"
+
+    def iter_range(self, fetch, instrument_name, timeframe, start, end, now_ms=None):
+        """Yield candles in [start, end] oldest first, fetching only what is missing.
+
+        ``fetch(start, end)`` must yield server candles for that range in order.
+        ``now_ms`` decides which candle is still open; pass the run's anchor
+        so a replayed run splits closed and open candles as it was recorded.
+        """
+        step = timeframe_ms(timeframe)
+        span = self.bucket_candles * step
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        open_start = now_ms // step * step
+
+        # Work out which part of each bucket must come from the server. Cached
+        # buckets are mapped up front so later evictions cannot pull them away.
+        plan = []
+        for bucket_start in range(start // span * span, end + 1, span):
+            bucket_end = bucket_start + span - 1
+            key = self.key(instrument_name, timeframe, bucket_start)
+            stored = self.load(key)
+            covered = self.manifest[key]["covered_until"] if stored is not None else bucket_start - 1
+            if min(end, bucket_end) <= covered:
+                self.hits += 1
+                plan.append((key, bucket_start, bucket_end, None, stored))
+            else:
+                self.misses += 1
+                plan.append((key, bucket_start, bucket_end, covered + 1, stored))
+
+        # Contiguous missing buckets go out as one paginated fetch each, which
+        # is consumed a bucket at a time: stored and served as it streams in
+        i = 0
+        while i < len(plan):
+            if plan[i][3] is None:
+                yield from self.serve(plan[i][4], [], start, end)
+                i += 1
+                continue
+            j = i
+            while j + 1 < len(plan) and plan[j + 1][3] == plan[j][2] + 1:
+                j += 1
+            candles = fetch(plan[i][3], min(plan[j][2], open_start + step - 1))
+            groups = itertools.groupby(candles, key=lambda c: int(c["t"]) // span * span)
+            group = next(groups, None)
+            for key, bucket_start, bucket_end, fetch_from, stored in plan[i:j + 1]:
+                fresh = []
+                while group is not None and group[0] <= bucket_start:
+                    if group[0] == bucket_start:
+                        fresh = list(group[1])
+                    group = next(groups, None)
+                covered_until = min(bucket_end, open_start - 1)
+                if covered_until >= fetch_from:
+                    closed = [c for c in fresh if int(c["t"]) < open_start]
+                    stored = self.store(key, stored, closed, covered_until)
+                # Open candles are served but never persisted
+                yield from self.serve(stored, [c for c in fresh if int(c["t"]) >= open_start], start, end)
+            i = j + 1
+
+    def serve(self, stored, tail, start, end):
+        if stored is not None:
+            lo, hi = np.searchsorted(stored["t"], [start, end + 1])
+            for row in stored[lo:hi]:
+                yield self.to_candle(row)
+        for candle in tail:
+            if start <= int(candle["t"]) <= end:
+                yield candle
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".npy")
+
+    def load(self, key):
+        with self.lock:
+            entry = self.manifest.get(key)
+            if entry is None or not os.path.exists(self.path(key)):
+                return None
+            entry["last_access"] = time.time()
+        return np.load(self.path(key), mmap_mode="r")
+
+    def store(self, key, stored, candles, covered_until):
+        rows = np.array(
+            [(int(c["t"]), float(c["o"]), float(c["h"]), float(c["l"]), float(c["c"]), float(c["v"]))
+             for c in candles],
+            dtype=CANDLE_DTYPE
+        )
+        if stored is not None and len(stored):
+            rows = np.concatenate([np.asarray(stored), rows[rows["t"] > stored["t"][-1]]])
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Replace atomically so open memory maps of the old file stay valid
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, rows)
+        os.replace(path + ".tmp", path)
+        with self.lock:
+            self.manifest[key] = {
+                "covered_until": int(covered_until),
+                "bytes": os.path.getsize(path),
+                "last_access": time.time(),
+            }
+            self.evict()
+            self.save_manifest()
+        return np.load(path, mmap_mode="r") if key in self.manifest else rows
+
+    def evict(self):
+        total = sum(e["bytes"] for e in self.manifest.values())
+        for key in sorted(self.manifest, key=lambda k: self.manifest[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.manifest.pop(key)["bytes"]
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            self.evictions += 1
+
+    def save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def to_candle(row):
+        # Same shape as the exchange payload: integer t, decimal strings for OHLCV
+        return {
+            "t": int(row["t"]),
+            "o": repr(float(row["o"])),
+            "h": repr(float(row["h"])),
+            "l": repr(float(row["l"])),
+            "c": repr(float(row["c"])),
+            "v": repr(float(row["v"])),
+        }
@@ -0,0 +1,109 @@
+from operator import itemgetter
+
+import numpy as np
+
+from tests.utils.json_codec import loads, typed_decoder
+
+CANDLE_DTYPE = np.dtype([
+    ("t", "<i8"),
+    ("o", "<f8"),
+    ("h", "<f8"),
+    ("l", "<f8"),
+    ("c", "<f8"),
+    ("v", "<f8"),
+])
+
+_row = itemgetter("t", "o", "h", "l", "c", "v")
+
+
+class Candles:
+    """Typed column view of a get-candlestick payload.
+
+    ``t`` is int64 milliseconds and OHLCV are float64. The check methods are
+    vectorised and return the indices of offending rows (empty when valid).
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.t = rows["t"]
+        self.o = rows["o"]
+        self.h = rows["h"]
+        self.l = rows["l"]
+        self.c = rows["c"]
+        self.v = rows["v"]
+
+    @classmethod
+    def from_payload(cls, payload):
+        """Decode a response body, its ``result``, a ``data`` list or any candle iterable."""
+        if isinstance(payload, dict):
+            payload = payload.get("result", payload).get("data", [])
+        # numpy parses the decimal strings while building the structured array
+        return cls(np.array(list(map(_row, payload)), dtype=CANDLE_DTYPE))
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Decode a raw response body, straight from typed structs when msgspec is installed."""
+        decode = typed_decoder("candlestick")
+        if decode is None:
+            return cls.from_payload(loads(raw))
+        result = decode(raw).result
+        rows = [(c.t, c.o, c.h, c.l, c.c, c.v) for c in result.data] if result else []
+        return cls(np.array(rows, dtype=CANDLE_DTYPE))
+
+    @classmethod
+    def concat(cls, parts):
+        return cls(np.concatenate([p.rows for p in parts]) if parts else np.empty(0, CANDLE_DTYPE))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return Candles(self.rows[index])
+
+    def interval_violations(self, step_ms, tolerance_ms=0):
+        # Index of the later candle of every pair not ~step_ms apart
+        gaps = np.diff(self.t)
+        return np.flatnonzero(np.abs(gaps - step_ms) > tolerance_ms) + 1
+
+    def range_violations(self, start=None, end=None):
+        bad = np.zeros(len(self), dtype=bool)
+        if start is not None:
+            bad |= self.t < start
+        if end is not None:
+            bad |= self.t > end
+        return np.flatnonzero(bad)
+
+    def order_violations(self, strict=True):
+        gaps = np.diff(self.t)
+        return np.flatnonzero(gaps <= 0 if strict else gaps < 0) + 1
+
+    def ohlc_violations(self):
+        # l <= o, c <= h and non-negative volume
+        bad = (
+            (self.l > np.minimum(self.o, self.c))
+            | (self.h < np.maximum(self.o, self.c))
+            | (self.l > self.h)
+            | (self.v < 0)
+            | ~np.isfinite(self.o) | ~np.isfinite(self.h)
+            | ~np.isfinite(self.l) | ~np.isfinite(self.c)
+        )
+        return np.flatnonzero(bad)
+
+    def resample(self, step_ms):
+        """Group-reduce rows (sorted by ``t``) into ``step_ms`` buckets.
+
+        Returns the coarser Candles and how many rows went into each bar.
+        """
+        if not len(self):
+            return Candles(np.empty(0, CANDLE_DTYPE)), np.empty(0, np.int64)
+        buckets = self.t // step_ms * step_ms
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[starts, len(self)])
+        out = np.empty(len(starts), CANDLE_DTYPE)
+        out["t"] = buckets[starts]
+        out["o"] = self.o[starts]
+        out["h"] = np.maximum.reduceat(self.h, starts)
+        out["l"] = np.minimum.reduceat(self.l, starts)
+        out["c"] = self.c[starts + counts - 1]
+        out["v"] = np.add.reduceat(self.v, starts)
+        return Candles(out), counts
@@ -0,0 +1,84 @@
+class Histogram:
+    """Log-linear (HDR-style) histogram of non-negative integer values.
+
+    Values below ``2 ** precision_bits`` are counted exactly; above that each
+    power of two is split into ``2 ** (precision_bits - 1)`` buckets, so any
+    recorded value is reproduced within ``2 ** -(precision_bits - 1)`` relative
+    error (under 1.6% at the default) with memory growing only with the
+    logarithm of the range.
+    """
+
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.half = precision_bits - 1
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def key(self, value):
+        shift = max(0, value.bit_length() - self.precision_bits)
+        return (shift << self.half) + (value >> shift)
+
+    def bounds(self, key):
+        shift = max(0, (key >> self.half) - 1)
+        mantissa = key - (shift << self.half)
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = int(value)
+        if value < 0:
+            value = 0
+        # key() inlined: this runs once per observation on hot paths
+        shift = value.bit_length() - self.precision_bits
+        key = (shift << self.half) + (value >> shift) if shift > 0 else value
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + count
+        self.total += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``-th percentile (0-100)."""
+        if not self.total:
+            return None
+        rank = max(1, -(-self.total * q // 100))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(self.bounds(key)[1], self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else None
+
+    def summary(self, percentiles=(50, 90, 99, 99.9), scale=1):
+        """count/min/mean/max and the given percentiles, divided by ``scale``."""
+        def scaled(value):
+            return None if value is None else round(value / scale, 3)
+
+        summary = {"count": self.total, "min": scaled(self.min), "mean": scaled(self.mean()), "max": scaled(self.max)}
+        for q in percentiles:
+            summary[f"p{q:g}"] = scaled(self.percentile(q))
+        return summary
+
+    def to_dict(self):
+        # Sparse [lower bound, count] pairs; enough to rebuild and merge later
+        return {
+            "precision_bits": self.precision_bits,
+            "buckets": [[self.bounds(key)[0], self.counts[key]] for key in sorted(self.counts)],
+        }
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Fastest first; JSON_BACKEND forces one of them
+PREFERENCE = ("orjson", "msgspec", "json")
+
+
+def available_backends():
+    backends = {"json": json.loads}
+    if orjson is not None:
+        backends["orjson"] = orjson.loads
+    if msgspec is not None:
+        backends["msgspec"] = msgspec.json.Decoder().decode
+    return backends
+
+
+def select_backend(name=None):
+    """``(name, loads)`` for the requested backend, or the fastest installed one."""
+    backends = available_backends()
+    name = name or os.getenv("JSON_BACKEND")
+    if name:
+        if name not in backends:
+            raise ValueError(f"JSON backend {name!r} is not installed (available: {', '.join(backends)})")
+        return name, backends[name]
+    name = next(n for n in PREFERENCE if n in backends)
+    return name, backends[name]
+
+
+# Decoder used for WS frames and REST bodies; accepts str or bytes
+backend, loads = select_backend()
+
+# What a failed decode raises under any backend: json and orjson raise
+# ValueError subclasses, msgspec a DecodeError that older releases do not
+# derive from ValueError
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else (ValueError,)
+
+
+if msgspec is not None:
+    # Typed payloads: fields are decoded straight into these structs (numeric
+    # strings to floats for candles) and anything not declared is skipped
+
+    class Candle(msgspec.Struct):
+        t: int
+        o: float
+        h: float
+        l: float
+        c: float
+        v: float
+
+    class CandleResult(msgspec.Struct):
+        instrument_name: Optional[str] = None
+        interval: Optional[str] = None
+        data: list[Candle] = []
+
+    class CandleResponse(msgspec.Struct):
+        code: int = 0
+        method: Optional[str] = None
+        message: Optional[str] = None
+        result: Optional[CandleResult] = None
+
+    class BookLevels(msgspec.Struct):
+        bids: list[list[str]] = []
+        asks: list[list[str]] = []
+
+    class BookEntry(msgspec.Struct):
+        bids: list[list[str]] = []
+        asks: list[list[str]] = []
+        update: Optional[BookLevels] = None
+        t: int = 0
+        u: Optional[int] = None
+        pu: Optional[int] = None
+
+    class BookResult(msgspec.Struct):
+        channel: str = ""
+        subscription: str = ""
+        instrument_name: Optional[str] = None
+        depth: Optional[int] = None
+        data: list[BookEntry] = []
+
+    class BookFrame(msgspec.Struct):
+        id: Optional[int] = None
+        method: str = ""
+        code: int = 0
+        message: Optional[str] = None
+        result: Optional[BookResult] = None
+
+    TYPED_DECODERS = {
+        "candlestick": msgspec.json.Decoder(CandleResponse, strict=False),
+        "book": msgspec.json.Decoder(BookFrame),
+    }
+else:
+    TYPED_DECODERS = {}
+
+
+def typed_decoder(kind):
+    """Decode function for ``"candlestick"`` responses or ``"book"`` frames into structs.
+
+    Returns None when msgspec is not installed, so callers can fall back to
+    ``loads``.
+    """
+    decoder = TYPED_DECODERS.get(kind)
+    return decoder.decode if decoder is not None else None
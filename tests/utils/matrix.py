@@ -0,0 +1,33 @@
+import itertools
+import json
+import os
+
+PAYLOADS_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "data", "test_payloads.json")
+
+
+def load_payloads(path=PAYLOADS_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def expand_matrix(spec, resolve_time):
+    """One case per instrument x timeframe x range of a matrix spec.
+
+    ``spec`` lists ``instrument_name``, ``timeframe`` and ``ranges`` (dicts
+    with optional ``name``, ``start``, ``end`` and extra ``expected``
+    entries); its ``expected`` strings apply to every case. Time expressions
+    go through ``resolve_time`` so equal cases produce equal parameters.
+    """
+    cases = []
+    for instrument_name, timeframe, time_range in itertools.product(
+            spec["instrument_name"], spec["timeframe"], spec.get("ranges") or [{}]):
+        params = {"instrument_name": instrument_name, "timeframe": timeframe}
+        for key in ("start", "end"):
+            if key in time_range:
+                params[key] = resolve_time(time_range[key])
+        cases.append({
+            "name": f"{instrument_name} {timeframe} {time_range.get('name', 'latest')}",
+            "params": params,
+            "expected": list(spec.get("expected", [])) + list(time_range.get("expected", [])),
+        })
+    return cases
@@ -0,0 +1,271 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tests.utils.histogram import Histogram
+
+# Export boundaries (seconds) for latency histograms; storage is log-linear
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DECODE_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+# WS readers time the decode of 1 in DECODE_SAMPLE frames to keep per-frame overhead low
+DECODE_SAMPLE = 8
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class CounterValue:
+    def __init__(self):
+        self.count = 0
+        self.sources = []
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.count += amount
+
+    def track(self, source):
+        """Also count ``source()``, a plain int a hot path maintains itself."""
+        self.sources.append(source)
+
+    @property
+    def value(self):
+        return self.count + sum(source() for source in self.sources)
+
+
+class GaugeValue:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class HistogramValue:
+    """Observations kept in a log-linear Histogram of ``value * scale`` integers."""
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.histogram = Histogram()
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.histogram.record(value * self.scale)
+
+    def observe_ns(self, ns):
+        # Skips the float round trip for perf_counter_ns deltas (scale 1e9)
+        with self.lock:
+            self.histogram.record(ns)
+
+
+class Metric:
+    """A named metric family; ``labels(...)`` returns the cached child for a label set.
+
+    Hot paths should look the child up once and keep it.
+    """
+
+    def __init__(self, kind, name, help, labelnames=(), scale=1e9, buckets=LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.scale = scale
+        self.buckets = buckets
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.get(key)
+                if child is None:
+                    if len(key) != len(self.labelnames):
+                        raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+                    child = self.new_child()
+                    self.children[key] = child
+        return child
+
+    def new_child(self):
+        if self.kind == "counter":
+            return CounterValue()
+        if self.kind == "gauge":
+            return GaugeValue()
+        return HistogramValue(self.scale)
+
+    # Unlabelled metrics act as their only child
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            labels = format_labels(self.labelnames, key)
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{labels} {child.value}")
+                continue
+            with child.lock:
+                buckets = sorted(child.histogram.counts.items())
+                total, total_sum = child.histogram.total, child.histogram.sum
+            cumulative, i = 0, 0
+            for le in self.buckets:
+                # A stored bucket counts towards ``le`` when its upper bound fits
+                while i < len(buckets) and child.histogram.bounds(buckets[i][0])[1] <= le * self.scale:
+                    cumulative += buckets[i][1]
+                    i += 1
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, ('le', f'{le:g}'))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, ('le', '+Inf'))} {total}")
+            lines.append(f"{self.name}_sum{labels} {total_sum / self.scale:g}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Process-wide metric families with Prometheus text export."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def register(self, kind, name, help, labelnames=(), **options):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = Metric(kind, name, help, labelnames, **options)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register("counter", name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register("gauge", name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), scale=1e9, buckets=LATENCY_BUCKETS):
+        """Histogram of seconds by default; pass ``scale=1`` for plain integer values."""
+        return self.register("histogram", name, help, labelnames, scale=scale, buckets=buckets)
+
+    def render(self):
+        return "\n".join(m.render() for m in self.metrics.values() if m.children) + "\n"
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    def serve(self, port, host="0.0.0.0"):
+        """Expose ``/metrics`` on a background HTTP server for scraping."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_):
+                pass
+
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def snapshot(self):
+        """Current values, to diff against later with ``summary_since``."""
+        values = {}
+        for metric in list(self.metrics.values()):
+            for key, child in list(metric.children.items()):
+                if metric.kind == "histogram":
+                    with child.lock:
+                        values[(metric.name, key)] = dict(child.histogram.counts)
+                else:
+                    values[(metric.name, key)] = child.value
+        return values
+
+    def summary_since(self, snapshot):
+        """Plain-text report of what changed since ``snapshot``: counter and
+        histogram deltas (count, p50, p99, max) and current gauge values."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            for key, child in sorted(metric.children.items()):
+                name = f"{metric.name}{format_labels(metric.labelnames, key)}"
+                before = snapshot.get((metric.name, key))
+                if metric.kind == "counter":
+                    delta = child.value - (before or 0)
+                    if delta:
+                        lines.append(f"{name} +{delta:g}")
+                elif metric.kind == "gauge":
+                    lines.append(f"{name} = {child.value:g}")
+                else:
+                    delta = Histogram(child.histogram.precision_bits)
+                    with child.lock:
+                        counts = dict(child.histogram.counts)
+                    for bucket, count in counts.items():
+                        count -= (before or {}).get(bucket, 0)
+                        if count:
+                            delta.record(delta.bounds(bucket)[0], count)
+                    if delta.total:
+                        p50, p99, top = (v / metric.scale for v in (delta.percentile(50), delta.percentile(99), delta.max))
+                        lines.append(f"{name} n={delta.total} p50={p50:.6g} p99={p99:.6g} max={top:.6g}")
+        return "\n".join(lines)
+
+
+metrics = MetricsRegistry()
+
+# === Client metrics ===
+REST_REQUEST_SECONDS = metrics.histogram(
+    "rest_request_seconds", "REST request latency including retries", ("method", "status"))
+REST_RESPONSE_BYTES = metrics.histogram(
+    "rest_response_bytes", "REST response body size", ("method",), scale=1,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+WS_CONNECT_SECONDS = metrics.histogram(
+    "ws_connect_seconds", "WebSocket connect and handshake time", ("client",))
+WS_FIRST_FRAME_SECONDS = metrics.histogram(
+    "ws_subscribe_first_frame_seconds", "Subscribe request to first data frame", ("client", "channel"))
+WS_DECODE_SECONDS = metrics.histogram(
+    "ws_frame_decode_seconds", "JSON decode time per WS frame", ("client",), buckets=DECODE_BUCKETS)
+WS_FRAMES = metrics.counter("ws_frames_total", "WS frames received", ("client",))
+WS_BYTES = metrics.counter("ws_bytes_total", "WS payload bytes received", ("client",))
+WS_QUEUE_DEPTH = metrics.gauge("ws_queue_depth", "Frames waiting in the consumer queue", ("client",))
+WS_RECONNECTS = metrics.counter("ws_reconnects_total", "WS reconnect attempts", ("client",))
+WS_DOWNTIME_SECONDS = metrics.histogram(
+    "ws_downtime_seconds", "Disconnect to resumed connection", ("client",))
+WS_MISSED_RANGES = metrics.counter(
+    "ws_missed_sequence_ranges_total", "Book sequence gaps (across reconnects or pu mismatches)", ("client",))
+WS_MISSED_SEQUENCES = metrics.counter(
+    "ws_missed_sequences_total", "Book sequence numbers skipped inside the gaps", ("client",))
+WS_RESYNC_DROPPED = metrics.counter(
+    "ws_resync_dropped_frames_total", "Deltas dropped while waiting for a fresh snapshot", ("client",))
+
+# === Step metrics ===
+STEP_SECONDS = metrics.histogram("behave_step_seconds", "behave step duration", ("step_type", "status"))
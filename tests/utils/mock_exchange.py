@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import functools
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+from tests.utils.api_client import timeframe_ms
+from tests.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BASE_PRICES = {"BTC_USDT": 60000.0, "ETH_USDT": 3000.0, "CRO_USDT": 0.1}
+BOOK_CHANNEL = re.compile(r"^book\.([A-Za-z0-9_]+)\.(\d+)$")
+MAX_DEPTH = 150
+BAD_REQUEST = 10004
+SYS_ERROR = 10001
+
+
+# Synthetic candles are generated top-down so every timeframe agrees: each
+# daily bar is split into 6 x 4h, each 4h into 4 x 1h and so on down to 1m
+DAY_MS = 86_400_000
+CANDLE_TREE = {DAY_MS: 6, 14_400_000: 4, 3_600_000: 4, 900_000: 3, 300_000: 5}
+PARENT_STEP = {parent // n: parent for parent, n in CANDLE_TREE.items()}
+
+
+def daily_candle(instrument_name, t):
+    # Seeded by (instrument, day) so the same candle is served every time
+    rnd = random.Random(zlib.crc32(f"{instrument_name}:{DAY_MS}:{t}".encode()))
+    base = BASE_PRICES.get(instrument_name, 100.0)
+    o = base * (1 + rnd.uniform(-0.02, 0.02))
+    c = o * (1 + rnd.uniform(-0.01, 0.01))
+    h = max(o, c) * (1 + rnd.uniform(0.001, 0.005))
+    l = min(o, c) * (1 - rnd.uniform(0.001, 0.005))
+    return tuple(round(x, 4) for x in (o, h, l, c, rnd.uniform(1000, 5000)))
+
+
+def split_candle(parent, n, rnd):
+    """Split an (o, h, l, c, v) bar into ``n`` consecutive bars that aggregate back to it."""
+    o, h, l, c, v = parent
+    path = [o] + [round(rnd.uniform(l, h), 4) for _ in range(n - 1)] + [c]
+    high_at, low_at = rnd.randrange(n), rnd.randrange(n)
+    weights = [rnd.uniform(0.5, 1.5) for _ in range(n)]
+    volumes = [round(v * w / sum(weights), 4) for w in weights[:-1]]
+    volumes.append(round(v - sum(volumes), 4))
+    children = []
+    for i in range(n):
+        co, cc = path[i], path[i + 1]
+        top, bottom = max(co, cc), min(co, cc)
+        ch = h if i == high_at else round(top + rnd.uniform(0, h - top) / 2, 4)
+        cl = l if i == low_at else round(bottom - rnd.uniform(0, bottom - l) / 2, 4)
+        children.append((co, ch, cl, cc, volumes[i]))
+    return children
+
+
+@functools.lru_cache(maxsize=65536)
+def child_candles(instrument_name, step, t):
+    rnd = random.Random(zlib.crc32(f"{instrument_name}:{step}:{t}:split".encode()))
+    return split_candle(tree_candle(instrument_name, step, t), CANDLE_TREE[step], rnd)
+
+
+def tree_candle(instrument_name, step, t):
+    if step == DAY_MS:
+        return daily_candle(instrument_name, t)
+    parent_step = PARENT_STEP[step]
+    parent_t = t // parent_step * parent_step
+    return child_candles(instrument_name, parent_step, parent_t)[(t - parent_t) // step]
+
+
+def aggregate(bars):
+    return (bars[0][0], max(b[1] for b in bars), min(b[2] for b in bars), bars[-1][3], sum(b[4] for b in bars))
+
+
+def synthetic_candle(instrument_name, step, t):
+    if step in CANDLE_TREE or step in PARENT_STEP:
+        bar = tree_candle(instrument_name, step, t)
+    else:
+        # Timeframes off the tree (30m, 2h, 12h, 7D, ...) aggregate the widest tree step dividing them
+        child = max(s for s in (*CANDLE_TREE, 60_000) if step % s == 0 and s < step)
+        bar = aggregate([tree_candle(instrument_name, child, t + i * child) for i in range(step // child)])
+    o, h, l, c, v = bar
+    return {"o": f"{o:.4f}", "h": f"{h:.4f}", "l": f"{l:.4f}", "c": f"{c:.4f}", "v": f"{v:.4f}", "t": t}
+
+
+class SyntheticBook:
+    """Random-walk book for one instrument, as full depth snapshots or deltas.
+
+    ``next`` draws a fresh book around a drifting mid; ``delta`` changes a
+    few quantities of the last one and now and then swaps a side's worst
+    level for one further out, so the book keeps ``depth`` levels per side.
+    Every frame advances ``u``; deltas carry the previous one as ``pu``.
+    """
+
+    def __init__(self, instrument_name, depth, seed=None):
+        self.instrument_name = instrument_name
+        self.depth = depth
+        self.mid = BASE_PRICES.get(instrument_name, 100.0)
+        self.tick = self.mid * 1e-5
+        self.rnd = random.Random(seed)
+        self.u = 0
+        self.bids = []
+        self.asks = []
+
+    def level(self, price):
+        return [f"{price:.6f}", f"{self.rnd.uniform(0.01, 5):.4f}", str(self.rnd.randint(1, 9))]
+
+    def next(self, t):
+        self.mid += self.rnd.gauss(0, self.tick * 3)
+        self.u += 1
+        self.bids = [self.level(self.mid - self.tick * (i + 1)) for i in range(self.depth)]
+        self.asks = [self.level(self.mid + self.tick * (i + 1)) for i in range(self.depth)]
+        return {"bids": self.bids, "asks": self.asks, "t": t, "tt": t, "u": self.u}
+
+    def delta(self, t):
+        pu, self.u = self.u, self.u + 1
+        changes = {"bids": [], "asks": []}
+        for name, levels in (("bids", self.bids), ("asks", self.asks)):
+            for i in self.rnd.sample(range(len(levels)), min(2, len(levels))):
+                levels[i] = self.level(float(levels[i][0]))
+                changes[name].append(levels[i])
+        if self.rnd.random() < 0.3:
+            name, levels, away = self.rnd.choice((("bids", self.bids, -1), ("asks", self.asks, 1)))
+            worst = levels.pop()
+            changes[name].append([worst[0], "0", "0"])
+            levels.append(self.level(float(worst[0]) + away * self.tick))
+            changes[name].append(levels[-1])
+        return {"update": changes, "t": t, "tt": t, "u": self.u, "pu": pu}
+
+
+class MockExchange:
+    """In-process stand-in for the exchange's public REST and book WebSocket API.
+
+    Serves ``public/get-candlestick`` with deterministic synthetic candles and
+    the ``book.{instrument}.{depth}`` channel at ``rate`` frames/s per
+    subscription, either replaying recorded frames from a ``fixtures`` JSON
+    lines file or generating a synthetic book. ``latency`` (seconds) delays
+    responses and back-dates frame timestamps, ``error_rate`` makes that
+    fraction of REST calls fail with HTTP 500, and ``disconnect_after`` drops
+    each WS connection after that many pushed frames. With ``deltas`` the
+    synthetic book is pushed as a ``book`` snapshot every ``snapshot_every``
+    frames and ``book.update`` deltas (``u``/``pu`` chained) in between.
+    """
+
+    def __init__(self, host="127.0.0.1", rest_port=0, ws_port=0, rate=10.0, latency=0.0,
+                 error_rate=0.0, disconnect_after=None, fixtures=None,
+                 instruments=tuple(BASE_PRICES), seed=None, deltas=False, snapshot_every=100):
+        self.host = host
+        self.rest_port = rest_port
+        self.ws_port = ws_port
+        self.rate = rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.disconnect_after = disconnect_after
+        self.deltas = deltas
+        self.snapshot_every = snapshot_every
+        self.instruments = set(instruments)
+        self.seed = seed
+        self.rnd = random.Random(seed)
+        self.fixtures = self.load_fixtures(fixtures) if fixtures else {}
+        # Last (u, time) pushed per channel, so sequences continue across connections
+        self.sequences = {}
+        self.rest_requests = 0
+        self.ws_connections = 0
+        self.frames_sent = 0
+        self.http = None
+        self.stopped = None
+        self.loop = None
+        self.thread = None
+        self.base_url = None
+        self.ws_url = None
+
+    @staticmethod
+    def load_fixtures(path):
+        # Recorded book frames grouped by subscription
+        fixtures = {}
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                frame = json.loads(line)
+                subscription = (frame.get("result") or {}).get("subscription")
+                if subscription and "data" in frame["result"]:
+                    fixtures.setdefault(subscription, []).append(frame["result"])
+        return fixtures
+
+    # === REST ===
+
+    def candlestick_response(self, query):
+        instrument_name = query.get("instrument_name")
+        timeframe = query.get("timeframe")
+        if not instrument_name or not timeframe:
+            return 400, {"id": -1, "method": "public/get-candlestick", "code": BAD_REQUEST, "message": "missing parameter"}
+        try:
+            step = timeframe_ms(timeframe)
+        except ValueError:
+            return 400, {"id": -1, "method": "public/get-candlestick", "code": BAD_REQUEST, "message": "invalid timeframe"}
+        if instrument_name not in self.instruments:
+            return 400, {"id": -1, "method": "public/get-candlestick", "code": BAD_REQUEST, "message": "invalid instrument_name"}
+        now = int(time.time() * 1000)
+        end = int(query["end"]) if query.get("end", "").isdigit() else now
+        start = int(query["start"]) if query.get("start", "").isdigit() else None
+        count = min(int(query.get("count") or query.get("limit") or 300), 5000)
+        last = min(end, now) // step * step
+        first = last - (count - 1) * step
+        if start is not None:
+            first = max(first, -(-start // step) * step)
+        data = [synthetic_candle(instrument_name, step, t) for t in range(first, last + 1, step)]
+        return 200, {
+            "id": -1,
+            "method": "public/get-candlestick",
+            "code": 0,
+            "result": {"instrument_name": instrument_name, "interval": timeframe, "data": data}
+        }
+
+    def make_handler(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_):
+                pass
+
+            def do_GET(self):
+                exchange.rest_requests += 1
+                if exchange.latency:
+                    time.sleep(exchange.latency)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if exchange.error_rate and exchange.rnd.random() < exchange.error_rate:
+                    status, body = 500, {"id": -1, "code": SYS_ERROR, "message": "injected error"}
+                elif url.path.endswith("public/get-candlestick"):
+                    status, body = exchange.candlestick_response(query)
+                else:
+                    status, body = 404, {"id": -1, "code": BAD_REQUEST, "message": "unknown method"}
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+    # === WebSocket ===
+
+    def check_channel(self, channel):
+        m = BOOK_CHANNEL.match(channel)
+        return bool(m) and m.group(1) in self.instruments and 0 < int(m.group(2)) <= MAX_DEPTH
+
+    async def push_book(self, ws, channel, sent):
+        instrument_name, depth = channel.split(".")[1], int(channel.split(".")[2])
+        recorded = self.fixtures.get(channel)
+        book = SyntheticBook(instrument_name, depth, seed=self.rnd.random())
+        # Frames "published" while nobody listened show up as a sequence gap
+        last_u, last_time = self.sequences.get(channel, (0, time.monotonic()))
+        book.u = last_u + int((time.monotonic() - last_time) * self.rate)
+        interval = 1.0 / self.rate
+        due = time.monotonic()
+        i = 0
+        while True:
+            # Pace against an absolute schedule so high rates are not lost to sleep jitter
+            due += interval
+            # yield even when behind so other connections keep being served
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            t = int((time.time() - self.latency) * 1000)
+            if recorded:
+                result = dict(recorded[i % len(recorded)])
+                result["data"] = [dict(entry, t=t) for entry in result["data"]]
+            elif self.deltas and i % self.snapshot_every:
+                result = {
+                    "instrument_name": instrument_name,
+                    "subscription": channel,
+                    "channel": "book.update",
+                    "depth": depth,
+                    "data": [book.delta(t)]
+                }
+            else:
+                result = {
+                    "instrument_name": instrument_name,
+                    "subscription": channel,
+                    "channel": "book",
+                    "depth": depth,
+                    "data": [book.next(t)]
+                }
+            i += 1
+            await ws.send(json.dumps({"method": "subscribe", "result": result}))
+            self.sequences[channel] = (book.u, time.monotonic())
+            self.frames_sent += 1
+            sent[0] += 1
+            if self.disconnect_after and sent[0] >= self.disconnect_after:
+                await ws.close(code=1011, reason="injected disconnect")
+                return
+
+    async def handle(self, ws):
+        self.ws_connections += 1
+        pushers = {}
+        sent = [0]
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                method = request.get("method")
+                channels = (request.get("params") or {}).get("channels", [])
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if method == "subscribe":
+                    if not channels or not all(self.check_channel(c) for c in channels):
+                        await ws.send(json.dumps({"id": request.get("id"), "method": method, "code": BAD_REQUEST,
+                                                  "message": f"invalid channel {channels}"}))
+                        continue
+                    for channel in channels:
+                        if channel not in pushers:
+                            pushers[channel] = asyncio.create_task(self.push_book(ws, channel, sent))
+                    await ws.send(json.dumps({"id": request.get("id"), "method": method, "code": 0}))
+                elif method == "unsubscribe":
+                    for channel in channels:
+                        task = pushers.pop(channel, None)
+                        if task:
+                            task.cancel()
+                    await ws.send(json.dumps({"id": request.get("id"), "method": method, "code": 0}))
+                elif method == "public/respond-heartbeat":
+                    continue
+                else:
+                    await ws.send(json.dumps({"id": request.get("id"), "method": method, "code": BAD_REQUEST,
+                                              "message": "unknown method"}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in pushers.values():
+                task.cancel()
+
+    # === Lifecycle ===
+
+    def start(self):
+        self.http = ThreadingHTTPServer((self.host, self.rest_port), self.make_handler())
+        self.http.daemon_threads = True
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.base_url = f"http://{self.host}:{self.http.server_address[1]}/v2"
+
+        ready = threading.Event()
+
+        async def serve():
+            self.stopped = asyncio.Event()
+            # Short close_timeout: clients that drop without finishing the close
+            # handshake would otherwise hold up injected disconnects and stop()
+            async with websockets.serve(self.handle, self.host, self.ws_port, close_timeout=1) as server:
+                port = next(iter(server.sockets)).getsockname()[1]
+                self.ws_url = f"ws://{self.host}:{port}/v2/market"
+                ready.set()
+                await self.stopped.wait()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(serve())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait(timeout=10)
+        logger.info(f"Mock exchange up: REST {self.base_url}, WS {self.ws_url}")
+        return self
+
+    def stop(self):
+        if self.http is not None:
+            self.http.shutdown()
+            self.http.server_close()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+            self.thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock exchange standalone")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rest-port", type=int, default=8080)
+    parser.add_argument("--ws-port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=10.0, help="book frames/s per subscription")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-after", type=int)
+    parser.add_argument("--fixtures")
+    parser.add_argument("--deltas", action="store_true", help="push book.update deltas between snapshots")
+    args = parser.parse_args()
+    exchange = MockExchange(args.host, args.rest_port, args.ws_port, args.rate, args.latency,
+                            args.error_rate, args.disconnect_after, args.fixtures, deltas=args.deltas).start()
+    print(f"BASE_URL={exchange.base_url}\nWS_URL={exchange.ws_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    main()
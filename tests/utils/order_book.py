@@ -0,0 +1,158 @@
+from bisect import bisect_left, insort
+from decimal import Decimal
+
+
+def to_ticks(value, scale=8):
+    """Fixed-point integer for a decimal string, e.g. "101.5" -> 10150000000."""
+    if "e" in value or "E" in value:
+        return int(Decimal(value).scaleb(scale))
+    whole, _, frac = value.partition(".")
+    return int(whole + (frac + "0" * scale)[:scale])
+
+
+class BookSide:
+    """Price levels of one side, keyed by integer ticks, best level first."""
+
+    def __init__(self, descending):
+        self.descending = descending
+        self.levels = {}
+        # Sorted sort-keys (negated ticks for bids) so index 0 is always best
+        self.keys = []
+
+    def set(self, price, qty):
+        key = -price if self.descending else price
+        if qty == 0:
+            if self.levels.pop(price, None) is not None:
+                del self.keys[bisect_left(self.keys, key)]
+        else:
+            if price not in self.levels:
+                insort(self.keys, key)
+            self.levels[price] = qty
+
+    def clear(self):
+        self.levels.clear()
+        self.keys.clear()
+
+    def best(self):
+        if not self.keys:
+            return None
+        price = -self.keys[0] if self.descending else self.keys[0]
+        return price, self.levels[price]
+
+    def top(self, n):
+        prices = [-k for k in self.keys[:n]] if self.descending else self.keys[:n]
+        return [(p, self.levels[p]) for p in prices]
+
+    def __len__(self):
+        return len(self.levels)
+
+
+class OrderBook:
+    """Book built from ``book`` snapshots and ``book.update`` deltas.
+
+    Prices and quantities are held as fixed-point ticks (``scale`` decimal
+    places). Every applied frame is checked for crossed/empty sides, the
+    depth limit and sequence gaps (``pu`` not matching the last ``u``);
+    problems are counted on the book instead of raised.
+    """
+
+    def __init__(self, instrument_name=None, depth=None, scale=8):
+        self.instrument_name = instrument_name
+        self.depth = depth
+        self.scale = scale
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.t = None
+        self.u = None
+        self.updates = 0
+        self.max_levels = 0
+        self.crossed = 0
+        self.empty = 0
+        self.gaps = []
+
+    def apply(self, result):
+        """Apply every entry of a book WS ``result`` dict or typed ``BookResult``."""
+        if not isinstance(result, dict):
+            self.apply_typed(result)
+            return
+        channel = result.get("channel")
+        for entry in result.get("data", []):
+            if channel == "book.update":
+                self.apply_update(entry)
+            else:
+                self.apply_snapshot(entry)
+
+    def apply_snapshot(self, entry):
+        self.bids.clear()
+        self.asks.clear()
+        self.set_levels(self.bids, entry.get("bids", []))
+        self.set_levels(self.asks, entry.get("asks", []))
+        self.t = entry.get("t", self.t)
+        self.u = entry.get("u", self.u)
+        self.checked()
+
+    def apply_update(self, entry):
+        pu = entry.get("pu")
+        if self.u is not None and pu is not None and pu != self.u:
+            self.gaps.append((self.u, pu))
+        update = entry.get("update", entry)
+        self.set_levels(self.bids, update.get("bids", []))
+        self.set_levels(self.asks, update.get("asks", []))
+        self.t = entry.get("t", self.t)
+        self.u = entry.get("u", self.u)
+        self.checked()
+
+    def apply_typed(self, result):
+        # Same as apply_snapshot/apply_update, reading struct attributes
+        for entry in result.data:
+            if result.channel == "book.update":
+                if self.u is not None and entry.pu is not None and entry.pu != self.u:
+                    self.gaps.append((self.u, entry.pu))
+                levels = entry.update or entry
+            else:
+                self.bids.clear()
+                self.asks.clear()
+                levels = entry
+            self.set_levels(self.bids, levels.bids)
+            self.set_levels(self.asks, levels.asks)
+            self.t = entry.t or self.t
+            self.u = entry.u if entry.u is not None else self.u
+            self.checked()
+
+    def set_levels(self, side, levels):
+        for level in levels:
+            side.set(to_ticks(level[0], self.scale), to_ticks(level[1], self.scale))
+
+    def checked(self):
+        self.updates += 1
+        self.max_levels = max(self.max_levels, len(self.bids), len(self.asks))
+        if not len(self.bids) or not len(self.asks):
+            self.empty += 1
+        elif self.is_crossed():
+            self.crossed += 1
+
+    def is_crossed(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        return bid is not None and ask is not None and bid[0] >= ask[0]
+
+    def price(self, ticks):
+        return ticks / 10 ** self.scale
+
+    def best_bid(self):
+        best = self.bids.best()
+        return best and (self.price(best[0]), self.price(best[1]))
+
+    def best_ask(self):
+        best = self.asks.best()
+        return best and (self.price(best[0]), self.price(best[1]))
+
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        return self.price(ask[0] - bid[0]) if bid and ask else None
+
+    def top(self, n):
+        """Depth-n view: ([(price, qty)...] bids, [(price, qty)...] asks)."""
+        return (
+            [(self.price(p), self.price(q)) for p, q in self.bids.top(n)],
+            [(self.price(p), self.price(q)) for p, q in self.asks.top(n)],
+        )
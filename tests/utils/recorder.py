@@ -0,0 +1,233 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict, deque, namedtuple
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+REST_REQUEST = 1
+REST_RESPONSE = 2
+WS_SEND = 3
+WS_FRAME = 4
+# Meta only: the run's time anchor, {"now_ms": ...}
+RUN_ANCHOR = 5
+
+# Record: kind, monotonic ns since recording start, meta length, body length
+RECORD = struct.Struct("<BqII")
+# Block: magic, compressed length, raw length, record count
+BLOCK = struct.Struct("<4sIII")
+BLOCK_MAGIC = b"TRB1"
+# Index entry: block file offset, first record time, record count
+INDEX = struct.Struct("<qqI")
+
+Record = namedtuple("Record", "kind t_ns meta body")
+
+
+class TrafficRecorder:
+    """Append-only, block-compressed log of the REST and WS traffic of one run.
+
+    Records carry a monotonic timestamp, a small JSON meta dict and the raw
+    body bytes, so full payloads survive rather than the truncated copies in
+    Allure. Records are buffered and written as zlib blocks; ``<path>.idx``
+    holds one fixed-size entry per block (offset, first timestamp, count) so
+    readers can seek by time without inflating earlier blocks.
+    """
+
+    def __init__(self, path, block_bytes=256 * 1024, level=6):
+        self.path = path
+        self.block_bytes = block_bytes
+        self.level = level
+        self.origin = time.monotonic_ns()
+        self.buffer = bytearray()
+        self.count = 0
+        self.first_t = None
+        self.closed = False
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One run per log: timestamps and the run anchor restart with each recording
+        self.file = open(path, "wb")
+        self.index = open(path + ".idx", "wb")
+
+    def record(self, kind, meta, body=b""):
+        if isinstance(body, str):
+            body = body.encode()
+        meta_raw = json.dumps(meta, separators=(",", ":")).encode()
+        t_ns = time.monotonic_ns() - self.origin
+        with self.lock:
+            # Late frames from connections still shutting down are dropped
+            if self.closed:
+                return
+            if self.first_t is None:
+                self.first_t = t_ns
+            self.buffer += RECORD.pack(kind, t_ns, len(meta_raw), len(body))
+            self.buffer += meta_raw
+            self.buffer += body
+            self.count += 1
+            if len(self.buffer) >= self.block_bytes:
+                self.flush_block()
+
+    def flush_block(self):
+        if not self.count:
+            return
+        compressed = zlib.compress(bytes(self.buffer), self.level)
+        offset = self.file.tell()
+        self.file.write(BLOCK.pack(BLOCK_MAGIC, len(compressed), len(self.buffer), self.count))
+        self.file.write(compressed)
+        self.file.flush()
+        self.index.write(INDEX.pack(offset, self.first_t, self.count))
+        self.index.flush()
+        self.buffer.clear()
+        self.count = 0
+        self.first_t = None
+
+    def flush(self):
+        with self.lock:
+            self.flush_block()
+
+    def close(self):
+        with self.lock:
+            self.flush_block()
+            self.closed = True
+        self.file.close()
+        self.index.close()
+
+
+class TrafficLog:
+    """Reader for a TrafficRecorder log."""
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = []
+        with open(path + ".idx", "rb") as f:
+            raw = f.read()
+        for i in range(0, len(raw) - len(raw) % INDEX.size, INDEX.size):
+            self.blocks.append(INDEX.unpack_from(raw, i))
+
+    def records(self, kinds=None, since_ns=0):
+        with open(self.path, "rb") as f:
+            for n, (offset, first_t, count) in enumerate(self.blocks):
+                # Every record in a block is older than the next block's first one
+                if n + 1 < len(self.blocks) and self.blocks[n + 1][1] < since_ns:
+                    continue
+                f.seek(offset)
+                magic, compressed_len, _, _ = BLOCK.unpack(f.read(BLOCK.size))
+                if magic != BLOCK_MAGIC:
+                    raise ValueError(f"Corrupt traffic log block at offset {offset}")
+                data = zlib.decompress(f.read(compressed_len))
+                pos = 0
+                for _ in range(count):
+                    kind, t_ns, meta_len, body_len = RECORD.unpack_from(data, pos)
+                    pos += RECORD.size
+                    meta = json.loads(data[pos:pos + meta_len])
+                    pos += meta_len
+                    body = data[pos:pos + body_len]
+                    pos += body_len
+                    if t_ns >= since_ns and (kinds is None or kind in kinds):
+                        yield Record(kind, t_ns, meta, body)
+
+
+def paced(records, speed=None):
+    """Re-emit records on their original schedule scaled by ``speed`` (None: no waits)."""
+    start = None
+    for record in records:
+        if speed:
+            if start is None:
+                start = (time.monotonic(), record.t_ns)
+            due = start[0] + (record.t_ns - start[1]) / 1e9 / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        yield record
+
+
+def request_key(method, url):
+    # Time params take part too: runs pin them to the recorded anchor
+    parsed = urlparse(url)
+    return f"{method} {parsed.path}?{sorted(parse_qsl(parsed.query))}"
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport that answers from recorded REST responses.
+
+    Responses are matched on method, path and the full query, so the run
+    must resolve times against the recorded anchor (``TrafficReplay.now_ms``).
+    Repeats of one key are served in recorded order (the last one repeats),
+    after the recorded latency scaled by ``speed``.
+    """
+
+    def __init__(self, log, speed=None):
+        super().__init__()
+        self.speed = speed
+        self.responses = defaultdict(deque)
+        for record in log.records(kinds={REST_RESPONSE}):
+            self.responses[record.meta["key"]].append(record)
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url)
+        queue = self.responses.get(key)
+        if not queue:
+            raise requests.ConnectionError(f"No recorded response for {key}")
+        record = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.speed:
+            time.sleep(record.meta.get("elapsed", 0) / self.speed)
+        response = requests.Response()
+        response.status_code = record.meta["status"]
+        response.headers.update(record.meta.get("headers", {}))
+        response._content = record.body
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+
+class TrafficReplay:
+    """Recorded traffic to feed back through APIClient and WSConnectionPool.
+
+    ``speed`` scales the original timing (1.0 is real time); None replays as
+    fast as possible.
+    """
+
+    def __init__(self, path, speed=None):
+        self.log = TrafficLog(path)
+        self.speed = speed
+        self.segments = None
+        self.lock = threading.Lock()
+        self.now_ms = next((r.meta["now_ms"] for r in self.log.records(kinds={RUN_ANCHOR})), None)
+
+    def rest_adapter(self):
+        return ReplayAdapter(self.log, self.speed)
+
+    def next_segment(self, channel):
+        """Frames answering the next recorded subscription to ``channel``."""
+        with self.lock:
+            if self.segments is None:
+                self.segments = self.channel_segments()
+            queue = self.segments.get(channel)
+            if not queue:
+                return []
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def channel_segments(self):
+        # Each recorded subscribe starts a segment holding that request and
+        # the frames routed to its channel until the next subscribe
+        segments = defaultdict(deque)
+        current = {}
+        for record in self.log.records(kinds={WS_SEND, WS_FRAME}):
+            if record.kind == WS_SEND:
+                request = json.loads(record.body)
+                if request.get("method") != "subscribe":
+                    continue
+                for channel in request.get("params", {}).get("channels", []):
+                    current[channel] = [record]
+                    segments[channel].append(current[channel])
+            elif record.meta.get("channel") in current:
+                current[record.meta["channel"]].append(record)
+        return segments
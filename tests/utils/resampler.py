@@ -0,0 +1,106 @@
+import numpy as np
+
+from tests.utils.api_client import timeframe_ms
+from tests.utils.candles import CANDLE_DTYPE, Candles
+
+RESAMPLE_TIMEFRAMES = ("5m", "15m", "1h", "4h", "1D")
+
+
+class Resampler:
+    """Builds coarser bars incrementally from a stream of base (1m) candles.
+
+    Each fed chunk is reduced per timeframe with one vectorised group-reduce
+    (``Candles.resample``); only the last, possibly unfinished bar of every
+    timeframe is carried over and merged with the next chunk. Chunks must
+    arrive in ``t`` order, as ``APIClient.iter_candlesticks`` yields them.
+    A bar is complete when every base candle of its bucket was seen.
+    """
+
+    def __init__(self, timeframes=RESAMPLE_TIMEFRAMES, base="1m"):
+        self.base_ms = timeframe_ms(base)
+        self.steps = {tf: timeframe_ms(tf) for tf in timeframes}
+        self.closed = {tf: [] for tf in timeframes}
+        self.closed_counts = {tf: [] for tf in timeframes}
+        self.open = {tf: None for tf in timeframes}
+        self.last_t = None
+        self.fed = 0
+
+    def feed(self, candles):
+        """Add a chunk: Candles, or candle dicts as in a get-candlestick ``data`` list."""
+        if not isinstance(candles, Candles):
+            candles = Candles.from_payload(candles)
+        if self.last_t is not None:
+            # Drop rows repeated across page edges
+            candles = candles[candles.t > self.last_t]
+        if not len(candles):
+            return self
+        self.last_t = int(candles.t[-1])
+        self.fed += len(candles)
+        for tf, step in self.steps.items():
+            bars, counts = candles.resample(step)
+            carried = self.open[tf]
+            if carried is not None:
+                bar, count = carried
+                if bar["t"] == bars.t[0]:
+                    bars.o[0] = bar["o"]
+                    bars.h[0] = max(bar["h"], bars.h[0])
+                    bars.l[0] = min(bar["l"], bars.l[0])
+                    bars.v[0] += bar["v"]
+                    counts[0] += count
+                else:
+                    self.closed[tf].append(np.array([bar], CANDLE_DTYPE))
+                    self.closed_counts[tf].append(np.array([count]))
+            self.closed[tf].append(bars.rows[:-1])
+            self.closed_counts[tf].append(counts[:-1])
+            self.open[tf] = (bars.rows[-1].copy(), int(counts[-1]))
+        return self
+
+    def feed_stream(self, candles, chunk=1000):
+        """Consume an iterable of candle dicts in chunks of ``chunk``."""
+        batch = []
+        for candle in candles:
+            batch.append(candle)
+            if len(batch) == chunk:
+                self.feed(batch)
+                batch = []
+        if batch:
+            self.feed(batch)
+        return self
+
+    def bars(self, timeframe, complete_only=True):
+        """All bars built so far for ``timeframe`` and their base candle counts."""
+        rows, counts = list(self.closed[timeframe]), list(self.closed_counts[timeframe])
+        if self.open[timeframe] is not None:
+            bar, count = self.open[timeframe]
+            rows.append(np.array([bar], CANDLE_DTYPE))
+            counts.append(np.array([count]))
+        bars = Candles(np.concatenate(rows) if rows else np.empty(0, CANDLE_DTYPE))
+        counts = np.concatenate(counts) if counts else np.empty(0, np.int64)
+        if complete_only:
+            full = counts == self.steps[timeframe] // self.base_ms
+            return bars[full], counts[full]
+        return bars, counts
+
+
+def diff_bars(local, server, price_rtol=1e-9, volume_rtol=1e-4, volume_atol=1e-6):
+    """Compare locally built bars with server bars on their common timestamps.
+
+    Returns ``{"compared", "missing", "mismatches"}``: ``missing`` lists local
+    bar times the server did not return and each mismatch is
+    ``(t, field, local, server)``.
+    """
+    if not isinstance(server, Candles):
+        server = Candles.from_payload(server)
+    common, li, si = np.intersect1d(local.t, server.t, return_indices=True)
+    mismatches = []
+    for field in ("o", "h", "l", "c", "v"):
+        a, b = local.rows[field][li], server.rows[field][si]
+        rtol, atol = (volume_rtol, volume_atol) if field == "v" else (price_rtol, 0)
+        for i in np.flatnonzero(~np.isclose(a, b, rtol=rtol, atol=atol)):
+            mismatches.append((int(common[i]), field, float(a[i]), float(b[i])))
+    mismatches.sort()
+    return {
+        "compared": len(common),
+        "missing": np.setdiff1d(local.t, server.t).tolist(),
+        "mismatches": mismatches,
+    }
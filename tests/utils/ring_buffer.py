@@ -0,0 +1,88 @@
+from tests.utils.json_codec import loads
+
+
+def frame_bytes(raw):
+    # Wire size; ASCII text (the usual JSON frame) needs no encoding to measure
+    if isinstance(raw, str) and not raw.isascii():
+        return len(raw.encode())
+    return len(raw)
+
+
+class FrameRing:
+    """Bounded ring of raw WebSocket frames, decoded only when read.
+
+    Frames are addressed by an absolute sequence number that keeps growing
+    as old frames are evicted, so readers can hold a position across
+    evictions. Retention is capped by frame count and optionally by bytes,
+    counted UTF-8 encoded for str frames.
+    """
+
+    def __init__(self, max_frames=10000, max_bytes=None):
+        self.capacity = max_frames
+        self.max_bytes = max_bytes
+        self.slots = [None] * max_frames
+        self.sizes = [0] * max_frames
+        self.start = 0
+        self.end = 0
+        self.size_bytes = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def append(self, raw):
+        if self.end - self.start == self.capacity:
+            self.evict()
+        slot = self.end % self.capacity
+        self.slots[slot] = raw
+        self.sizes[slot] = frame_bytes(raw)
+        self.end += 1
+        self.size_bytes += self.sizes[slot]
+        while self.max_bytes is not None and self.size_bytes > self.max_bytes and len(self) > 1:
+            self.evict()
+
+    def evict(self):
+        slot = self.start % self.capacity
+        self.size_bytes -= self.sizes[slot]
+        self.slots[slot] = None
+        self.start += 1
+        self.evicted += 1
+
+    def raw(self, since=0):
+        # Retained raw frames from absolute position `since` onwards
+        return [self.slots[i % self.capacity] for i in range(max(since, self.start), self.end)]
+
+    def decoded(self, since=0):
+        for raw in self.raw(since):
+            yield loads(raw)
+
+    def __iter__(self):
+        return self.decoded()
+
+
+class MessageStore:
+    """Per-channel FrameRings sharing one retention policy."""
+
+    def __init__(self, max_frames=10000, max_bytes=None):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.channels = {}
+
+    def ring(self, channel):
+        ring = self.channels.get(channel)
+        if ring is None:
+            ring = self.channels[channel] = FrameRing(self.max_frames, self.max_bytes)
+        return ring
+
+    def append(self, channel, raw):
+        self.ring(channel).append(raw)
+
+    def __getitem__(self, channel):
+        return self.channels[channel]
+
+    def __len__(self):
+        return sum(len(ring) for ring in self.channels.values())
+
+    @property
+    def size_bytes(self):
+        return sum(ring.size_bytes for ring in self.channels.values())
@@ -1,3 +1,6 @@
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import best_match
+
 candlestick_schema = {
     "type": "object",
     "properties": {
@@ -19,3 +22,124 @@ candlestick_schema = {
     },
     "required": ["data"]
 }
+
+# [price, quantity, order count] as decimal strings
+book_level_schema = {
+    "type": "array",
+    "items": {"type": "string"},
+    "minItems": 2
+}
+
+book_snapshot_schema = {
+    "type": "object",
+    "properties": {
+        "channel": {"type": "string"},
+        "subscription": {"type": "string"},
+        "instrument_name": {"type": "string"},
+        "depth": {"type": "integer"},
+        "data": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "bids": {"type": "array", "items": book_level_schema},
+                    "asks": {"type": "array", "items": book_level_schema},
+                    "t": {"type": "integer"},
+                    "u": {"type": "integer"}
+                },
+                "required": ["bids", "asks", "t"]
+            }
+        }
+    },
+    "required": ["channel", "subscription", "data"]
+}
+
+book_delta_schema = {
+    "type": "object",
+    "properties": {
+        "channel": {"type": "string"},
+        "subscription": {"type": "string"},
+        "instrument_name": {"type": "string"},
+        "data": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "update": {
+                        "type": "object",
+                        "properties": {
+                            "bids": {"type": "array", "items": book_level_schema},
+                            "asks": {"type": "array", "items": book_level_schema}
+                        }
+                    },
+                    "t": {"type": "integer"},
+                    "u": {"type": "integer"},
+                    "pu": {"type": "integer"}
+                },
+                "required": ["update", "t", "u"]
+            }
+        }
+    },
+    "required": ["channel", "subscription", "data"]
+}
+
+
+class SampledValidator:
+    """Fully validates 1 in ``every`` instances and only counts the rest."""
+
+    def __init__(self, validator, every=10, max_failures=100):
+        self.validator = validator
+        self.every = every
+        self.max_failures = max_failures
+        self.seen = 0
+        self.checked = 0
+        self.failures = []
+
+    def __call__(self, instance):
+        self.seen += 1
+        if (self.seen - 1) % self.every:
+            return True
+        self.checked += 1
+        if self.validator.is_valid(instance):
+            return True
+        if len(self.failures) < self.max_failures:
+            self.failures.append(best_match(self.validator.iter_errors(instance)).message)
+        return False
+
+
+class SchemaRegistry:
+    """Named schemas, each checked and compiled into a validator once."""
+
+    def __init__(self):
+        self.validators = {}
+
+    def register(self, name, schema):
+        Draft7Validator.check_schema(schema)
+        self.validators[name] = Draft7Validator(schema)
+
+    def validate(self, name, instance):
+        # Raises jsonschema.ValidationError with the most relevant error
+        validator = self.validators[name]
+        if not validator.is_valid(instance):
+            raise best_match(validator.iter_errors(instance))
+
+    def validate_batch(self, name, items):
+        """Validate each item; returns ``(index, message)`` for the invalid ones."""
+        validator = self.validators[name]
+        return [
+            (i, best_match(validator.iter_errors(item)).message)
+            for i, item in enumerate(items)
+            if not validator.is_valid(item)
+        ]
+
+    def sampler(self, name, every=10):
+        return SampledValidator(self.validators[name], every)
+
+
+registry = SchemaRegistry()
+registry.register("candlestick", candlestick_schema)
+registry.register("candlestick_item", candlestick_schema["properties"]["data"]["items"])
+registry.register("book_snapshot", book_snapshot_schema)
+registry.register("book_delta", book_delta_schema)
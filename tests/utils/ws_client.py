@@ -1,49 +1,222 @@
-import websocket
+import asyncio
+import itertools
 import json
-import threading
 import time
 
+import websockets
+
+from tests.utils.json_codec import loads
+from tests.utils.logger import get_logger
+from tests.utils.metrics import (DECODE_SAMPLE, WS_BYTES, WS_CONNECT_SECONDS, WS_DECODE_SECONDS, WS_DOWNTIME_SECONDS,
+                                 WS_FIRST_FRAME_SECONDS, WS_FRAMES, WS_QUEUE_DEPTH, WS_RECONNECTS)
+from tests.utils.reconnect import Backoff, SequenceTracker
+from tests.utils.recorder import WS_FRAME, WS_SEND
+from tests.utils.ring_buffer import MessageStore
+
+logger = get_logger(__name__)
+
+# Marks the end of the frame stream in the consumer queue
+_CLOSED = object()
+
+
 class WebSocketClient:
-    def __init__(self, ws_url):
+    """asyncio WebSocket client; many channels share one socket and event loop.
+
+    Decoded frames go into a bounded queue for ``async for`` consumers. The
+    reader never waits on the queue: heartbeats must be answered however far
+    behind the consumer is, or the exchange drops the socket. When the queue
+    is full its oldest frame is dropped and counted in ``frames_dropped``, so
+    memory stays bounded and a client nobody iterates just keeps dropping.
+    The first frame a consumer gets after a hole carries ``dropped_before``
+    (frames lost right before it), so a book rebuilt from the stream can
+    resync instead of silently going stale.
+    ``messages`` keeps a bounded raw history per channel either way. A
+    ``recorder`` (TrafficRecorder) logs every request and frame.
+    ``frames_received``, ``bytes_received`` and ``decode_ns`` count what the
+    reader has consumed.
+
+    A dropped socket is reopened after a jittered ``backoff`` and all topics
+    are subscribed again; deltas are then dropped until each topic's fresh
+    snapshot, and sequence gaps are kept in ``sequences``. Iteration ends
+    only on ``close()``, with ``reconnect=False`` or when retries run out.
+    """
+
+    def __init__(self, ws_url, max_queue=1000, open_timeout=10, max_frames=10000, max_bytes=None,
+                 recorder=None, reconnect=True, backoff=None):
         self.ws_url = ws_url
-        self.messages = []
+        self.recorder = recorder
+        self.reconnect = reconnect
+        self.backoff = backoff or Backoff()
+        self.sequences = SequenceTracker("asyncio")
+        self.closing = False
+        self.open_timeout = open_timeout
+        self.messages = MessageStore(max_frames, max_bytes)
         self.connected = False
+        self.subscriptions = {}
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.ids = itertools.count(1)
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.unseen_drops = 0
+        self.bytes_received = 0
+        self.decode_ns = 0
+        self.first_frame_pending = {}
+        self.decode_seconds = WS_DECODE_SECONDS.labels("asyncio")
+        WS_FRAMES.labels("asyncio").track(lambda: self.frames_received)
+        WS_BYTES.labels("asyncio").track(lambda: self.bytes_received)
+        self.queue_depth = WS_QUEUE_DEPTH.labels("asyncio")
+        self.ws = None
+        self.reader = None
 
-    def on_message(self, ws, message):
-        self.messages.append(json.loads(message))
+    async def connect(self):
+        if self.ws is None:
+            started = time.perf_counter()
+            self.ws = await websockets.connect(self.ws_url, open_timeout=self.open_timeout)
+            WS_CONNECT_SECONDS.labels("asyncio").observe(time.perf_counter() - started)
+            self.connected = True
+            self.reader = asyncio.create_task(self.read())
+        return self
 
-    def on_open(self, ws):
-        self.connected = True
+    async def send(self, method, channels):
+        await self.connect()
+        request = {
+            "method": method,
+            "params": {"channels": list(channels)},
+            "id": next(self.ids)
+        }
+        await self.send_raw(json.dumps(request))
+        return request
 
-    def on_error(self, ws, error):
-        print("WebSocket error:", error)
+    async def send_raw(self, raw):
+        if self.recorder is not None:
+            self.recorder.record(WS_SEND, {"url": self.ws_url}, raw)
+        await self.ws.send(raw)
 
-    def on_close(self, ws, close_status_code, close_msg):
-        self.connected = False
+    async def subscribe(self, *topics):
+        sent_at = time.perf_counter()
+        request = await self.send("subscribe", topics)
+        for topic in topics:
+            self.subscriptions[topic] = request["id"]
+            self.first_frame_pending[topic] = sent_at
+        return self
 
-    def subscribe(self, topic):
-        ws_app = websocket.WebSocketApp(
-            self.ws_url,
-            on_open=self.on_open,
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close
-        )
-
-        def run():
-            ws_app.run_forever()
-
-        thread = threading.Thread(target=run)
-        thread.daemon = True
-        thread.start()
-
-        time.sleep(2)
-        sub_msg = {
-            "method": "subscribe",
-            "params": {"channels": [topic]},
-            "id": 1
-        }
-        if self.connected:
-            ws_app.send(json.dumps(sub_msg))
+    async def unsubscribe(self, *topics):
+        await self.send("unsubscribe", topics)
+        for topic in topics:
+            self.subscriptions.pop(topic, None)
+        return self
+
+    async def read(self):
+        try:
+            while True:
+                await self.read_socket()
+                self.connected = False
+                if self.closing or not self.reconnect or not await self.resume():
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket reader for {self.ws_url} failed: {e!r}")
+        finally:
+            self.connected = False
+            # Always end the stream, or consumers would wait forever
+            self.enqueue(_CLOSED)
+
+    async def read_socket(self):
+        try:
+            async for message in self.ws:
+                started = time.perf_counter_ns()
+                frame = loads(message)
+                decode_ns = time.perf_counter_ns() - started
+                self.decode_ns += decode_ns
+                self.frames_received += 1
+                self.bytes_received += len(message)
+                if not self.frames_received % DECODE_SAMPLE:
+                    self.decode_seconds.observe_ns(decode_ns)
+                heartbeat = frame.get("method") == "public/heartbeat"
+                channel = None if heartbeat else (frame.get("result") or {}).get("subscription", "control")
+                if self.recorder is not None:
+                    self.recorder.record(WS_FRAME, {"url": self.ws_url, "channel": channel}, message)
+                if heartbeat:
+                    await self.send_raw(json.dumps({"id": frame.get("id"), "method": "public/respond-heartbeat"}))
+                    continue
+                result = frame.get("result")
+                if result is not None and not self.sequences.check(channel, result):
+                    continue
+                self.messages.append(channel, message)
+                sent_at = self.first_frame_pending.pop(channel, None)
+                if sent_at is not None:
+                    WS_FIRST_FRAME_SECONDS.labels("asyncio", channel).observe(time.perf_counter() - sent_at)
+                self.enqueue(frame)
+                self.queue_depth.set(self.queue.qsize())
+        except websockets.ConnectionClosed as e:
+            logger.warning(f"WebSocket closed: {e}")
+
+    def enqueue(self, frame):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+            self.unseen_drops += 1
+            if self.frames_dropped == 1:
+                logger.warning(f"WebSocket consumer behind on {self.ws_url}; dropping oldest queued frames")
+        self.queue.put_nowait(frame)
+
+    async def resume(self):
+        """Reopen the socket with backoff and resubscribe; False if giving up."""
+        disconnected_at = time.perf_counter()
+        attempt = 0
+        while True:
+            if self.backoff.exhausted(attempt):
+                logger.warning(f"WebSocket gave up reconnecting to {self.ws_url} after {attempt} attempts")
+                return False
+            delay = self.backoff.delay(attempt)
+            attempt += 1
+            WS_RECONNECTS.labels("asyncio").inc()
+            logger.warning(f"WebSocket reconnecting to {self.ws_url} in {delay:.2f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+            if self.closing:
+                return False
+            started = time.perf_counter()
+            try:
+                self.ws = await websockets.connect(self.ws_url, open_timeout=self.open_timeout)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                logger.warning(f"WebSocket reconnect failed: {e}")
+                continue
+            WS_CONNECT_SECONDS.labels("asyncio").observe(time.perf_counter() - started)
+            break
+        self.connected = True
+        WS_DOWNTIME_SECONDS.labels("asyncio").observe(time.perf_counter() - disconnected_at)
+        topics = list(self.subscriptions)
+        if topics:
+            self.sequences.resume(topics)
+            await self.subscribe(*topics)
+        return True
+
+    async def close(self):
+        self.closing = True
+        if self.reader is not None:
+            self.reader.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+        self.connected = False
+        # Wake any consumer still iterating
+        self.enqueue(_CLOSED)
 
+    def __aiter__(self):
         return self
+
+    async def __anext__(self):
+        frame = await self.queue.get()
+        if frame is _CLOSED:
+            raise StopAsyncIteration
+        if self.unseen_drops:
+            # The dropped frames were queued right before this one
+            frame["dropped_before"] = self.unseen_drops
+            self.unseen_drops = 0
+        return frame
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *_):
+        await self.close()
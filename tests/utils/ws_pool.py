@@ -0,0 +1,499 @@
+import itertools
+import json
+import socket
+import threading
+import time
+
+import websocket
+
+from tests.utils.json_codec import loads
+from tests.utils.logger import get_logger
+from tests.utils.metrics import (DECODE_SAMPLE, WS_BYTES, WS_CONNECT_SECONDS, WS_DECODE_SECONDS, WS_DOWNTIME_SECONDS,
+                                 WS_FIRST_FRAME_SECONDS, WS_FRAMES, WS_RECONNECTS)
+from tests.utils.reconnect import Backoff, SequenceTracker
+from tests.utils.recorder import WS_FRAME, WS_SEND, paced
+from tests.utils.ring_buffer import FrameRing
+from tests.utils.schema_validator import registry
+
+# Schema used to sample-validate data frames, by the frame's result.channel
+SCHEMA_BY_CHANNEL = {
+    "book": "book_snapshot",
+    "book.update": "book_delta",
+}
+
+logger = get_logger(__name__)
+
+
+class ChannelStream:
+    """Frames received for one subscribed channel on a shared connection.
+
+    Frames are retained raw in a bounded FrameRing; only the subscription
+    ack, the last error and the latest ``book`` snapshot are kept decoded,
+    along with the snapshot's ring position. Data frames are schema-validated
+    1 in ``schema_sample`` and counted otherwise.
+    """
+
+    def __init__(self, channel, max_frames=10000, max_bytes=None, schema_sample=10):
+        self.channel = channel
+        self.frames = FrameRing(max_frames, max_bytes)
+        self.schema_sample = schema_sample
+        self.samplers = {}
+        self.request = None
+        self.sent = False
+        self.sent_at = None
+        self.first_frame_seconds = None
+        self.ack = None
+        self.snapshot = None
+        self.snapshot_index = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+
+    def append(self, frame, raw):
+        result = frame.get("result")
+        if result and "data" in result:
+            if self.first_frame_seconds is None and self.sent_at is not None:
+                self.first_frame_seconds = time.perf_counter() - self.sent_at
+                WS_FIRST_FRAME_SECONDS.labels("pool", self.channel).observe(self.first_frame_seconds)
+            if result.get("channel") in SCHEMA_BY_CHANNEL:
+                self.sampler(result["channel"])(result)
+        with self.cond:
+            self.frames.append(raw)
+            self.cond.notify_all()
+            if frame.get("code", 0) != 0 or "error" in frame:
+                self.error = frame
+            elif result and "data" in result:
+                # Deltas only make sense on top of a full book
+                if result.get("channel") != "book.update":
+                    self.snapshot = frame
+                    self.snapshot_index = self.frames.end - 1
+            elif self.ack is None:
+                self.ack = frame
+
+    def sampler(self, result_channel):
+        sampler = self.samplers.get(result_channel)
+        if sampler is None:
+            sampler = registry.sampler(SCHEMA_BY_CHANNEL[result_channel], self.schema_sample)
+            self.samplers[result_channel] = sampler
+        return sampler
+
+    def schema_failures(self):
+        return [f for sampler in self.samplers.values() for f in sampler.failures]
+
+    def since(self, index):
+        with self.lock:
+            return self.frames.raw(index), self.frames.end
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+
+class MessageCursor:
+    """Per-scenario, list-like view over a channel stream.
+
+    A new cursor is seeded with the channel's subscription ack and starts at
+    the latest book snapshot, so a scenario joining a warm channel sees the
+    same first frames a cold subscription would: a full book, then every
+    delta since. If that snapshot has already left the ring it is seeded
+    decoded and the cursor follows the live stream from there on.
+    Iteration decodes one retained frame at a time.
+    """
+
+    def __init__(self, connection, stream):
+        self.connection = connection
+        self.stream = stream
+        with stream.lock:
+            self._seed = [f for f in (stream.ack, stream.error) if f is not None]
+            self._start = stream.frames.end
+            if stream.snapshot is not None:
+                if stream.snapshot_index >= stream.frames.start:
+                    self._start = stream.snapshot_index
+                else:
+                    self._seed.append(stream.snapshot)
+        self.closed = False
+
+    @property
+    def request(self):
+        return self.stream.request
+
+    @property
+    def error(self):
+        return self.connection.error
+
+    def wait_for(self, predicate, timeout):
+        """Block until a frame matches ``predicate`` and return it.
+
+        Wakes as soon as new frames arrive and only tests frames not seen by
+        this call yet. Returns None on timeout or when the connection errors.
+        """
+        deadline = time.monotonic() + timeout
+        for frame in self._seed:
+            if predicate(frame):
+                return frame
+        stream = self.stream
+        index = self._start
+        while True:
+            with stream.cond:
+                if stream.frames.end == index and not self.error:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    stream.cond.wait(remaining)
+            fresh, index = stream.since(index)
+            for raw in fresh:
+                frame = loads(raw)
+                if predicate(frame):
+                    return frame
+            if self.error or time.monotonic() >= deadline:
+                return None
+
+    def __iter__(self):
+        yield from self._seed
+        raw_frames, _ = self.stream.since(self._start)
+        for raw in raw_frames:
+            yield loads(raw)
+
+    def raw(self):
+        # Same frames as iteration, undecoded; for dumps and attachments
+        for frame in self._seed:
+            yield json.dumps(frame)
+        raw_frames, _ = self.stream.since(self._start)
+        yield from raw_frames
+
+    def __len__(self):
+        with self.stream.lock:
+            retained = self.stream.frames.end - max(self._start, self.stream.frames.start)
+        return len(self._seed) + retained
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        # Non-negative positions stream; negative ones need the whole window
+        if isinstance(index, slice):
+            if all(i is None or i >= 0 for i in (index.start, index.stop, index.step)):
+                return list(itertools.islice(self, index.start, index.stop, index.step))
+        elif index >= 0:
+            for frame in itertools.islice(self, index, None):
+                return frame
+            raise IndexError("cursor index out of range")
+        return list(self)[index]
+
+    def close(self):
+        # Detach only; the channel stays subscribed for the next scenario
+        self.closed = True
+
+
+class SharedConnection:
+    """One long-lived, multiplexed WebSocket per endpoint.
+
+    With a ``recorder`` (TrafficRecorder) every sent request and received
+    frame is logged along with the channel it was routed to; a ``capture``
+    (BookCapture) gets the top-of-book metrics of every data frame.
+
+    When the socket drops it is reopened after a jittered ``backoff`` and
+    every active channel is subscribed again. Each resumed channel then
+    waits for a fresh snapshot (deltas before it are dropped), and the
+    sequence gap across the outage is recorded in ``sequences``. Only a
+    failure before the first connect, or running out of retries, is
+    reported as ``error``.
+    """
+
+    def __init__(self, url, max_frames=10000, max_bytes=None, schema_sample=10, recorder=None,
+                 reconnect=True, backoff=None, capture=None):
+        self.url = url
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.schema_sample = schema_sample
+        self.recorder = recorder
+        self.capture = capture
+        # Plain ints on the socket thread, read by the counters at export time
+        self.frames_received = 0
+        self.bytes_received = 0
+        WS_FRAMES.labels("pool").track(lambda: self.frames_received)
+        WS_BYTES.labels("pool").track(lambda: self.bytes_received)
+        self.decode_seconds = WS_DECODE_SECONDS.labels("pool")
+        self.connect_started = None
+        self.reconnect = reconnect
+        self.backoff = backoff or Backoff()
+        self.attempt = 0
+        self.connected_once = False
+        self.disconnected_at = None
+        self.sequences = SequenceTracker("pool")
+        self.closing = threading.Event()
+        self.channels = {}
+        self.pending = {}
+        self.error = None
+        self.opened = threading.Event()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.app = None
+        self.thread = None
+        self.connect()
+
+    def connect(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # A fresh WebSocketApp per attempt, until closed or out of retries
+        while not self.closing.is_set():
+            self.connect_started = time.perf_counter()
+            self.app = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close
+            )
+            self.app.run_forever()
+            if self.closing.is_set() or not self.reconnect:
+                return
+            if self.disconnected_at is None:
+                self.disconnected_at = time.perf_counter()
+            if self.backoff.exhausted(self.attempt):
+                self.error = self.error or f"gave up reconnecting after {self.attempt} attempts"
+                self.wake_all()
+                return
+            delay = self.backoff.delay(self.attempt)
+            self.attempt += 1
+            WS_RECONNECTS.labels("pool").inc()
+            logger.warning(f"WS reconnecting to {self.url} in {delay:.2f}s (attempt {self.attempt})")
+            self.closing.wait(delay)
+
+    def send(self, payload):
+        raw = json.dumps(payload)
+        if self.recorder is not None:
+            self.recorder.record(WS_SEND, {"url": self.url}, raw)
+        self.app.send(raw)
+
+    def send_subscription(self, stream):
+        stream.sent_at = time.perf_counter()
+        try:
+            self.send(stream.request)
+        except websocket.WebSocketConnectionClosedException:
+            # Dropped in between; resume() sends it again on the next socket
+            logger.warning(f"WS closed before subscribing {stream.channel}")
+
+    def on_open(self, ws):
+        if self.closing.is_set():
+            # close() raced with a reconnect attempt
+            ws.close()
+            return
+        now = time.perf_counter()
+        WS_CONNECT_SECONDS.labels("pool").observe(now - self.connect_started)
+        logger.info(f"WS connected: {self.url}")
+        if self.disconnected_at is not None:
+            WS_DOWNTIME_SECONDS.labels("pool").observe(now - self.disconnected_at)
+            self.disconnected_at = None
+            self.resume()
+        self.connected_once = True
+        self.attempt = 0
+        self.error = None
+        self.opened.set()
+        for stream in self.unsent():
+            self.send_subscription(stream)
+
+    def on_message(self, ws, message):
+        self.frames_received += 1
+        self.bytes_received += len(message)
+        if self.frames_received % DECODE_SAMPLE:
+            frame = loads(message)
+        else:
+            started = time.perf_counter_ns()
+            frame = loads(message)
+            self.decode_seconds.observe_ns(time.perf_counter_ns() - started)
+        heartbeat = frame.get("method") == "public/heartbeat"
+        stream = None if heartbeat else self.route(frame)
+        if self.recorder is not None:
+            self.recorder.record(WS_FRAME, {"url": self.url, "channel": stream and stream.channel}, message)
+        if heartbeat:
+            self.send({"id": frame.get("id"), "method": "public/respond-heartbeat"})
+            return
+        if stream is not None:
+            result = frame.get("result")
+            if result is not None and not self.sequences.check(stream.channel, result):
+                return
+            if self.capture is not None and result and result.get("data"):
+                self.capture.record(stream.channel, result, len(message))
+            stream.append(frame, message)
+        else:
+            logger.debug(f"Dropping unrouted WS frame: {message[:200]}")
+
+    def on_error(self, ws, error):
+        logger.warning(f"WS error on {self.url}: {error}")
+        # Later drops are retried quietly; waiters keep waiting through them
+        if not self.connected_once or not self.reconnect:
+            self.error = str(error)
+            self.wake_all()
+
+    def on_close(self, ws, *_):
+        self.opened.clear()
+        if self.disconnected_at is None and not self.closing.is_set():
+            self.disconnected_at = time.perf_counter()
+        logger.info(f"WS closed: {self.url}")
+
+    def wake_all(self):
+        with self.lock:
+            streams = list(self.channels.values())
+        for stream in streams:
+            stream.wake()
+
+    def resume(self):
+        # Queue every accepted channel for re-subscription on the new socket,
+        # each under a fresh id so its ack is not a duplicate of the first
+        with self.lock:
+            active = [s for s in self.channels.values() if s.sent and s.error is None]
+            for stream in active:
+                stream.sent = False
+                self.pending.pop(stream.request["id"], None)
+                request_id = next(self.ids)
+                stream.request = dict(stream.request, id=request_id)
+                self.pending[request_id] = stream.channel
+        self.sequences.resume(stream.channel for stream in active)
+        logger.info(f"WS resuming {len(active)} channels on {self.url}")
+
+    def unsent(self):
+        with self.lock:
+            queued = [s for s in self.channels.values() if not s.sent]
+            for stream in queued:
+                stream.sent = True
+        return queued
+
+    def route(self, frame):
+        with self.lock:
+            channel = self.pending.get(frame.get("id"))
+            if channel is None:
+                channel = (frame.get("result") or {}).get("subscription")
+            return self.channels.get(channel)
+
+    def subscribe(self, channel):
+        with self.lock:
+            stream = self.channels.get(channel)
+            fresh = stream is None or stream.error is not None
+            if fresh:
+                # New channel, or a previous attempt was rejected: (re)send
+                stream = ChannelStream(channel, self.max_frames, self.max_bytes, self.schema_sample)
+                request_id = next(self.ids)
+                stream.request = {
+                    "method": "subscribe",
+                    "params": {"channels": [channel]},
+                    "id": request_id
+                }
+                self.channels[channel] = stream
+                self.pending[request_id] = channel
+        # Attach before sending so the subscriber sees the channel from its first frame
+        cursor = MessageCursor(self, stream)
+        if fresh and self.opened.is_set():
+            for queued in self.unsent():
+                self.send_subscription(queued)
+        return cursor
+
+    def drop(self):
+        """Close the current socket as a network drop would; it is then resumed.
+
+        Returns False when the connection does not reconnect.
+        """
+        raw = getattr(self.app and self.app.sock, "sock", None)
+        if not self.reconnect or raw is None:
+            return False
+        # Shut the raw socket so the blocked read fails now; app.close() would
+        # only be noticed on the dispatcher's next wake-up
+        try:
+            raw.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        return True
+
+    def close(self):
+        self.closing.set()
+        if self.app is not None:
+            self.app.close()
+        # The dispatcher only notices the close on its next select wake-up;
+        # the thread is a daemon so do not hold up teardown for it
+        self.thread.join(timeout=1)
+
+
+class ReplayConnection(SharedConnection):
+    """SharedConnection fed from a TrafficReplay instead of a socket.
+
+    Each subscribe plays back the frames recorded for the matching
+    subscription of the same channel, on the replay's time scale.
+    """
+
+    def __init__(self, url, replay, **options):
+        self.replay = replay
+        self.stopped = threading.Event()
+        super().__init__(url, **options)
+
+    def connect(self):
+        self.opened.set()
+
+    def send(self, payload):
+        if payload.get("method") != "subscribe":
+            return
+        for channel in payload["params"]["channels"]:
+            segment = self.replay.next_segment(channel)
+            if not segment:
+                logger.warning(f"No recorded traffic for {channel}")
+            threading.Thread(target=self.feed, args=(channel, segment), daemon=True).start()
+
+    def feed(self, channel, segment):
+        for record in paced(segment, self.replay.speed):
+            if self.stopped.is_set():
+                return
+            if record.kind != WS_FRAME:
+                continue
+            with self.lock:
+                stream = self.channels.get(channel)
+            message = record.body.decode()
+            stream.append(loads(message), message)
+
+    def drop(self):
+        # Recorded traffic has no socket to drop
+        return False
+
+    def close(self):
+        self.stopped.set()
+
+
+class WSConnectionPool:
+    """Session-scoped registry of shared connections, keyed by endpoint URL.
+
+    ``max_frames``/``max_bytes`` bound how much of each channel is retained;
+    ``schema_sample`` sets the 1-in-N rate for validating data frames.
+    ``recorder`` logs all traffic; ``replay`` (a TrafficReplay) serves
+    connections from a recording instead of the network. ``reconnect`` and
+    ``backoff`` (a Backoff) control recovery from dropped sockets. A
+    ``capture`` (BookCapture) collects top-of-book metrics of every data frame.
+    """
+
+    def __init__(self, max_frames=10000, max_bytes=None, schema_sample=10, recorder=None, replay=None,
+                 reconnect=True, backoff=None, capture=None):
+        self.options = dict(max_frames=max_frames, max_bytes=max_bytes, schema_sample=schema_sample,
+                            recorder=recorder, reconnect=reconnect, backoff=backoff, capture=capture)
+        self.replay = replay
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def connection(self, url):
+        with self.lock:
+            conn = self.connections.get(url)
+            if conn is None:
+                if self.replay is not None:
+                    conn = ReplayConnection(url, self.replay, **self.options)
+                else:
+                    conn = SharedConnection(url, **self.options)
+                self.connections[url] = conn
+            return conn
+
+    def subscribe(self, url, channel):
+        return self.connection(url).subscribe(channel)
+
+    def close(self):
+        with self.lock:
+            connections = list(self.connections.values())
+            self.connections.clear()
+        for conn in connections:
+            conn.close()